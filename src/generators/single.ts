@@ -91,7 +91,7 @@ export async function generateSingle(config: GeneratorConfig): Promise<void> {
           : `${config.backend.packageManager} install`;
     const backendRunCmd =
       config.backend.framework === "fastapi"
-        ? `python src/main.py`
+        ? `python -m src.server`
         : `${config.backend.packageManager} run dev`;
 
     logInfo("\n📦 Next steps:");
@@ -198,7 +198,7 @@ ${
     ? "pip install -r requirements.txt"
     : `${config.backend!.packageManager} install`
 }
-${config.backend!.framework === "fastapi" ? "python src/main.py" : `${config.backend!.packageManager} run dev`}
+${config.backend!.framework === "fastapi" ? "python -m src.server" : `${config.backend!.packageManager} run dev`}
 \`\`\``;
   } else if (config.frontend?.framework) {
     content += `\`\`\`bash
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from bench.drivers import DRIVERS, PROJECT_ROOT
+from bench.fixture import create_database, embedded_postgres, memory_users, seed_users
+from bench.report import BASELINE_PATH, load_baseline, print_report, save_baseline, summarize
+from bench.scenarios import SCENARIOS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark the user API")
+    parser.add_argument("scenarios", nargs="*", help=f"any of: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--driver", choices=list(DRIVERS), default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--users", type=int, default=10000, help="users seeded before each run")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds per scenario")
+    parser.add_argument("--database", default="bench_users", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    parser.add_argument("--store", choices=["postgres", "memory"], default="postgres", help="user_sql backend")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed fractional regression")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    return args
+
+
+async def drive(client, scenario, state: dict, concurrency: int, duration: float, record: bool):
+    latencies = []
+    errors = 0
+    messages = set()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await scenario(client, state)
+            except Exception as e:
+                errors += 1
+                messages.add(f"{type(e).__name__}: {e}")
+                continue
+            if record:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    for message in sorted(messages)[:5]:
+        print(f"error: {message}", file=sys.stderr)
+    return latencies, errors, elapsed
+
+
+async def run(args) -> int:
+    if args.store == "memory":
+        os.environ["USER_STORE"] = "memory"
+        os.environ["MEMORY_STORE_SEED"] = str(args.users)
+    else:
+        await create_database(args.database)
+        os.environ["DB_NAME"] = args.database
+
+    from src.sql.user_sql import user_table_schema
+
+    results = {}
+    for name in args.scenarios:
+        if args.store == "memory":
+            seeded = memory_users(args.users)
+        else:
+            seeded = await seed_users(args.database, user_table_schema, args.users)
+        state = {
+            "ids": seeded["ids"],
+            "search_modes": ["contains", "prefix", "fuzzy", "fulltext"] if seeded["trigrams"] else ["prefix", "fulltext"],
+        }
+        async with DRIVERS[args.driver](args.concurrency, args.workers) as client:
+            await drive(client, SCENARIOS[name], state, args.concurrency, args.warmup, record=False)
+            latencies, errors, elapsed = await drive(client, SCENARIOS[name], state, args.concurrency, args.duration, record=True)
+        driver = args.driver if args.store == "postgres" else f"{args.driver}/{args.store}"
+        results[f"{driver}:{name}"] = summarize(latencies, errors, elapsed)
+
+    regressions = print_report(results, load_baseline(args.baseline), args.tolerance)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
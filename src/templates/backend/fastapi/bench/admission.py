@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+import time
+
+from bench.drivers import PROJECT_ROOT
+
+sys.path.insert(0, str(PROJECT_ROOT))
+for name in ("RATE_LIMIT_RATE", "RATE_LIMIT_BURST", "API_KEY_RATE_LIMIT_RATE", "API_KEY_RATE_LIMIT_BURST"):
+    os.environ[name] = "1e9"
+
+from src.function.admission import AdmissionControl, AdmissionMiddleware, ConcurrencyGate  # noqa: E402
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def discard(message):
+    pass
+
+
+def request(method: str, path: str, headers=()) -> dict:
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"accept", b"*/*"), *headers],
+        "client": ("10.0.0.1", 5000),
+    }
+
+
+def behind_proxy(scope: dict) -> dict:
+    return {**scope, "client": ("127.0.0.1", 5000)}
+
+
+async def per_call(app, scope: dict, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        await app(dict(scope), None, discard)
+    return (time.perf_counter() - start) / number * 1e6
+
+
+async def main():
+    number = 100000
+    control = AdmissionControl(
+        "bench-key",
+        rate_limit=True,
+        client_header="X-Forwarded-For",
+        gates={
+            ("POST", "/users/"): ConcurrencyGate(1000, 0),
+            ("GET", "/users/search/{keyword}"): ConcurrencyGate(1000, 0),
+        },
+    )
+    middleware = AdmissionMiddleware(endpoint, control)
+
+    cases = [
+        ("ungated route, ip", request("GET", "/users/42")),
+        ("ungated route, key", request("GET", "/users/42", [(b"x-api-key", b"bench-key")])),
+        ("ungated route, proxy", behind_proxy(request("GET", "/users/42", [(b"x-forwarded-for", b"203.0.113.7")]))),
+        ("gated search", request("GET", "/users/search/alice")),
+        ("gated signup", request("POST", "/users/")),
+    ]
+    baseline = await per_call(endpoint, cases[0][1], number)
+    print(f"{'case':<20} {'us/request':>10} {'overhead':>9}")
+    print(f"{'no middleware':<20} {baseline:>10.2f}")
+    for name, scope in cases:
+        elapsed = await per_call(middleware, scope, number)
+        print(f"{name:<20} {elapsed:>10.2f} {elapsed - baseline:>8.2f}us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+import orjson
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT, asgi_client
+from bench.fixture import create_database, embedded_postgres, seed_users
+from bench.report import summarize
+from bench.scenarios import unique_user
+
+BULK_MIN_ROWS_PER_SECOND = float(os.getenv("BENCH_BULK_MIN_ROWS_PER_SECOND", "10000"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.bulk",
+        description="Measure POST /users/bulk throughput without hashing, and signup latency during a hashed import",
+    )
+    parser.add_argument("--rows", type=int, default=100000, help="rows per upload")
+    parser.add_argument("--users", type=int, default=10000, help="users seeded before the run")
+    parser.add_argument("--hashed-rows", type=int, default=200, help="rows in the hashed upload (0 skips it)")
+    parser.add_argument("--signups", type=int, default=4, help="concurrent POST /users/ clients during the hashed upload")
+    parser.add_argument("--database", default="bench_users", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    parser.add_argument(
+        "--min-rows-per-second",
+        type=float,
+        default=BULK_MIN_ROWS_PER_SECOND,
+        help="fail when the unhashed import is slower",
+    )
+    return parser.parse_args()
+
+
+def upload(rows: int) -> bytes:
+    return b"".join(orjson.dumps(unique_user()) + b"\n" for _ in range(rows))
+
+
+async def import_rows(client, body: bytes) -> tuple:
+    start = time.perf_counter()
+    response = await client.post("/users/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return response.json()["data"], elapsed
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    from src.function.hasher import password_hasher
+    from src.sql.user_sql import user_table_schema
+
+    await seed_users(args.database, user_table_schema, args.users)
+    body = upload(args.rows)
+    failures = 0
+
+    async with asgi_client(1 + args.signups) as client:
+        hashed = "$2b$04$" + "x" * 53
+
+        async def skip_hashing(passwords: list, chunk_size: int = 0) -> list:
+            return [hashed] * len(passwords)
+
+        password_hasher.hash_many = skip_hashing
+        try:
+            report, elapsed = await import_rows(client, body)
+        finally:
+            del password_hasher.hash_many
+        rate = report["inserted"] / elapsed
+        print(f"{'mode':<10} {'rows':>8} {'inserted':>9} {'seconds':>8} {'rows/s':>9}")
+        print(f"{'no hash':<10} {report['total']:>8} {report['inserted']:>9} {elapsed:>8.2f} {rate:>9.0f}")
+        if report["inserted"] != args.rows:
+            print(f"REGRESSION bulk: inserted {report['inserted']} of {args.rows} rows", file=sys.stderr)
+            failures += 1
+        if rate < args.min_rows_per_second:
+            print(f"REGRESSION bulk: {rate:.0f} rows/s, expected {args.min_rows_per_second:.0f}", file=sys.stderr)
+            failures += 1
+
+        if args.hashed_rows:
+            done = asyncio.Event()
+            latencies = []
+            statuses = {}
+
+            async def signer():
+                while not done.is_set():
+                    start = time.perf_counter()
+                    response = await client.post("/users/", json=unique_user())
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            async def importer():
+                try:
+                    return await import_rows(client, upload(args.hashed_rows))
+                finally:
+                    done.set()
+
+            (report, elapsed), *_ = await asyncio.gather(importer(), *(signer() for _ in range(args.signups)))
+            print(f"{'hashed':<10} {report['total']:>8} {report['inserted']:>9} {elapsed:>8.2f} {report['inserted'] / elapsed:>9.0f}")
+            summary = summarize(latencies, 0, elapsed)
+            print(
+                f"signups during the hashed import ({password_hasher.bulk_workers} of {password_hasher.workers} "
+                f"workers reserved for bulk): p50 {summary['p50_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms, {statuses}"
+            )
+    return 1 if failures else 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import argparse
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import orjson
+
+from bench.drivers import PROJECT_ROOT
+
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.function.compression import CODECS, COMPRESSION_MIN_SIZE, COMPRESSION_OFFLOAD_SIZE  # noqa: E402
+
+LEVELS = {
+    "gzip": (1, 6, 9),
+    "br": (1, 4, 6),
+    "zstd": (1, 3, 9),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m bench.compression", description="Compare compression CPU cost and bytes saved")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 10, 50, 200, 1000], help="users per payload")
+    parser.add_argument("--encodings", nargs="+", default=list(LEVELS), help="any of: gzip, br, zstd")
+    return parser.parse_args()
+
+
+def payload(rows: int) -> bytes:
+    now = datetime.utcnow()
+    users = [
+        {
+            "id": i,
+            "email": f"user{i}@example.com",
+            "username": f"user{i}",
+            "full_name": f"Bench User {i}",
+            "avatar_url": None,
+            "bio": f"Seeded user number {i}",
+            "role": "user",
+            "is_active": True,
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": now - timedelta(seconds=i),
+        }
+        for i in range(1, rows + 1)
+    ]
+    return orjson.dumps({"success": True, "data": users, "message": "Users retrieved successfully", "next_cursor": None})
+
+
+def cost_us(fn, data: bytes) -> float:
+    number = max(1, 200_000 // max(len(data), 1))
+    return min(timeit.repeat(lambda: fn(data), number=number, repeat=5)) / number * 1_000_000
+
+
+def main() -> int:
+    args = parse_args()
+    codecs = {}
+    for name in args.encodings:
+        codec, module = CODECS[name]
+        try:
+            codecs[name] = [codec(level) for level in LEVELS[name]]
+        except ImportError:
+            print(f"{name}: {module} is not installed, skipped", file=sys.stderr)
+
+    print(f"threshold {COMPRESSION_MIN_SIZE} B, offload above {COMPRESSION_OFFLOAD_SIZE} B\n")
+    print(f"{'rows':>6} {'bytes':>9} {'codec':<8} {'out':>9} {'ratio':>6} {'us':>9} {'MB/s':>8} {'us/KB saved':>12}")
+    for rows in args.rows:
+        data = payload(rows)
+        for name, levels in codecs.items():
+            for codec in levels:
+                compressed = codec.compress(data)
+                elapsed = cost_us(codec.compress, data)
+                saved_kb = max(len(data) - len(compressed), 1) / 1024
+                label = f"{name}-{LEVELS[name][levels.index(codec)]}"
+                print(
+                    f"{rows:>6} {len(data):>9} {label:<8} {len(compressed):>9} {len(data) / len(compressed):>6.1f} "
+                    f"{elapsed:>9.1f} {len(data) / elapsed:>8.1f} {elapsed / saved_kb:>12.2f}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
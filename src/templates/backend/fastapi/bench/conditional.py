@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+from dotenv import load_dotenv
+
+from bench.drivers import DRIVERS, PROJECT_ROOT
+from bench.fixture import create_database, embedded_postgres, seed_users
+from bench.report import summarize
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m bench.conditional", description="Measure ETag revalidation savings")
+    parser.add_argument("--driver", choices=list(DRIVERS), default="asgi")
+    parser.add_argument("--users", type=int, default=10000, help="users seeded before the run")
+    parser.add_argument("--polls", type=int, default=2000, help="requests per target and mode")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--database", default="bench_users", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    return parser.parse_args()
+
+
+def response_bytes(response) -> int:
+    head = sum(len(name) + len(value) + 4 for name, value in response.headers.raw)
+    return head + len(response.content)
+
+
+async def poll(client, paths: list, polls: int, concurrency: int, etags: dict = None):
+    latencies = []
+    transferred = 0
+    statuses = {}
+    remaining = polls
+
+    async def worker():
+        nonlocal remaining, transferred
+        while remaining > 0:
+            remaining -= 1
+            path = random.choice(paths)
+            headers = {"If-None-Match": etags[path]} if etags else {}
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            transferred += response_bytes(response)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, 0, elapsed), transferred / polls, statuses
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    from src.sql.user_sql import user_table_schema
+
+    seeded = await seed_users(args.database, user_table_schema, args.users)
+    targets = {
+        "user": [f"/users/{user_id}" for user_id in random.sample(seeded["ids"], 100)],
+        "list": ["/users/?limit=50"],
+        "list fields": ["/users/?limit=50&fields=id,username"],
+    }
+
+    async with DRIVERS[args.driver](args.concurrency) as client:
+        print(f"{'target':<12} {'mode':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'bytes/req':>10}  statuses")
+        for name, paths in targets.items():
+            etags = {}
+            for path in paths:
+                response = await client.get(path)
+                etags[path] = response.headers["etag"]
+
+            for mode, tags in (("full", None), ("revalidate", etags)):
+                summary, per_request, statuses = await poll(client, paths, args.polls, args.concurrency, tags)
+                print(
+                    f"{name:<12} {mode:<12} {summary['throughput']:>8.0f} {summary['p50_ms']:>8.2f} "
+                    f"{summary['p95_ms']:>8.2f} {per_request:>10.0f}  {statuses}"
+                )
+    return 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from contextlib import ExitStack
+
+import asyncpg
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT
+from bench.fixture import create_database, database_url, embedded_postgres, seed_users
+
+EXPLAIN_BUDGET_MS = float(os.getenv("BENCH_EXPLAIN_BUDGET_MS", "5"))
+
+# search_users before the search indexes: a leading-wildcard ILIKE with no limit.
+LEGACY_SEARCH = """
+    SELECT id, email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at
+    FROM users
+    WHERE is_active = true
+      AND (email ILIKE $1 OR username ILIKE $1 OR full_name ILIKE $1)
+    ORDER BY created_at DESC
+"""
+
+SEARCH_INDEX_NAMES = """
+    SELECT indexname
+    FROM pg_indexes
+    WHERE tablename = 'users'
+      AND (indexname LIKE '%\\_trgm' OR indexname LIKE '%\\_prefix' OR indexname LIKE 'idx\\_users\\_search%')
+"""
+
+SEARCH_COMPARISONS = (
+    ("contains", "ser123"),
+    ("prefix", "user12"),
+    ("fuzzy", "user1234"),
+    ("fulltext", "user1234"),
+)
+
+
+class PlanCheck:
+    def __init__(self, name: str, query: str, params: tuple, index: str = None, forbid: tuple = ("Sort", "Seq Scan"), trigrams: bool = False):
+        self.name = name
+        self.query = query
+        self.params = params
+        self.index = index
+        self.forbid = forbid
+        self.trigrams = trigrams
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m bench.explain", description="Check query plans of the user API")
+    parser.add_argument("--users", type=int, default=100000, help="users seeded before the checks")
+    parser.add_argument("--database", default="bench_explain", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    parser.add_argument("--budget-ms", type=float, default=EXPLAIN_BUDGET_MS, help="execution time budget per query")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    parser.add_argument(
+        "--compare-search",
+        action="store_true",
+        help="also compare each search mode with the pre-index ILIKE query",
+    )
+    parser.add_argument("--save-plans", metavar="PATH", help="write the before/after search plans as JSON")
+    return parser.parse_args()
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def build_checks(middle: tuple) -> list:
+    from src.sql import statements
+    from src.sql.user_sql import search_params
+
+    return [
+        PlanCheck("list first page", statements.list_users_statement(None, False), (20,), "idx_users_active_created_at"),
+        PlanCheck("list keyset page", statements.list_users_statement(None, True), (20, *middle), "idx_users_active_created_at"),
+        PlanCheck(
+            "search prefix",
+            statements.search_users_statement("prefix", None, False),
+            (20, *search_params("user12", "prefix")),
+            forbid=("Seq Scan",),
+        ),
+        PlanCheck(
+            "search contains",
+            statements.search_users_statement("contains", None, False),
+            (20, *search_params("ser123", "contains")),
+            forbid=("Seq Scan",),
+            trigrams=True,
+        ),
+        PlanCheck("role counts (summary)", statements.SELECT_USER_ROLE_COUNTS, (), forbid=()),
+    ]
+
+
+async def explain(conn, check: PlanCheck) -> dict:
+    rows = await conn.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {check.query}", *check.params)
+    return (json.loads(rows) if isinstance(rows, str) else rows)[0]
+
+
+def evaluate(check: PlanCheck, result: dict, budget_ms: float) -> list:
+    nodes = list(plan_nodes(result["Plan"]))
+    problems = []
+    for node in nodes:
+        if node["Node Type"] in check.forbid and node.get("Relation Name", "users") == "users":
+            problems.append(f"{node['Node Type']} node in plan")
+    if check.index and not any(node.get("Index Name") == check.index for node in nodes):
+        problems.append(f"{check.index} not used")
+    if result["Execution Time"] > budget_ms:
+        problems.append(f"{result['Execution Time']:.2f} ms exceeds {budget_ms:.0f} ms budget")
+    return problems
+
+
+def plan_summary(plan: dict) -> str:
+    nodes = []
+    for node in plan_nodes(plan):
+        label = node["Node Type"]
+        if node.get("Index Name"):
+            label += f" {node['Index Name']}"
+        nodes.append(label)
+    return " > ".join(nodes)
+
+
+async def compare_search(conn, trigrams: bool) -> dict:
+    from src.sql import statements
+    from src.sql.user_sql import search_params
+
+    plans = {}
+    print(f"{'search mode':<12} {'before ms':>10} {'after ms':>10} {'speedup':>8}  after plan")
+    for mode, keyword in SEARCH_COMPARISONS:
+        if mode in ("contains", "fuzzy") and not trigrams:
+            print(f"{mode:<12} skipped (pg_trgm unavailable)")
+            continue
+        # Dropping the search indexes inside a rolled back transaction gives the old plan
+        # on the same table without rebuilding them afterwards.
+        transaction = conn.transaction()
+        await transaction.start()
+        try:
+            for record in await conn.fetch(SEARCH_INDEX_NAMES):
+                await conn.execute(f'DROP INDEX "{record["indexname"]}"')
+            before = await explain(conn, PlanCheck(f"{mode} before", LEGACY_SEARCH, (f"%{keyword}%",)))
+        finally:
+            await transaction.rollback()
+
+        check = PlanCheck(mode, statements.search_users_statement(mode, None, False), (20, *search_params(keyword, mode)))
+        after = await explain(conn, check)
+        speedup = before["Execution Time"] / max(after["Execution Time"], 0.001)
+        print(
+            f"{mode:<12} {before['Execution Time']:>10.2f} {after['Execution Time']:>10.2f} {speedup:>7.0f}x"
+            f"  {plan_summary(after['Plan'])}"
+        )
+        plans[mode] = {"keyword": keyword, "before": before, "after": after}
+    return plans
+
+
+async def check_role_counts(conn) -> list:
+    from src.sql import statements
+
+    await conn.execute("UPDATE users SET role = 'moderator' WHERE id % 7 = 0")
+    await conn.execute("UPDATE users SET is_active = NOT is_active WHERE id % 11 = 0")
+    await conn.execute("DELETE FROM users WHERE id % 13 = 0")
+    live = [tuple(record) for record in await conn.fetch(statements.COUNT_USERS_BY_ROLE)]
+    summary = [tuple(record) for record in await conn.fetch(statements.SELECT_USER_ROLE_COUNTS)]
+    return [] if live == summary else [f"user_role_counts drifted: {summary} != {live}"]
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    from src.sql.schema import ROLE_COUNTS
+    from src.sql.user_sql import user_table_schema
+
+    seeded = await seed_users(args.database, user_table_schema, args.users)
+    conn = await asyncpg.connect(database_url(args.database))
+    try:
+        await conn.execute("DROP TABLE IF EXISTS user_role_counts")
+        await conn.execute(ROLE_COUNTS)
+        await conn.execute("ANALYZE")
+        middle = tuple(await conn.fetchrow(
+            "SELECT created_at, id FROM users WHERE is_active = true ORDER BY created_at DESC, id DESC OFFSET $1 LIMIT 1",
+            len(seeded["ids"]) // 2,
+        ))
+
+        failures = 0
+        for check in build_checks(middle):
+            if check.trigrams and not seeded["trigrams"]:
+                print(f"{check.name:<24} skipped (pg_trgm unavailable)")
+                continue
+            result = await explain(conn, check)
+            problems = evaluate(check, result, args.budget_ms)
+            status = "ok" if not problems else "FAIL"
+            print(f"{check.name:<24} {result['Execution Time']:8.3f} ms  {status}")
+            if args.verbose:
+                print(json.dumps(result["Plan"], indent=2))
+            for problem in problems:
+                print(f"REGRESSION {check.name}: {problem}", file=sys.stderr)
+            failures += bool(problems)
+
+        if args.compare_search:
+            print()
+            plans = await compare_search(conn, seeded["trigrams"])
+            if args.save_plans:
+                with open(args.save_plans, "w") as output:
+                    json.dump({"users": args.users, "plans": plans}, output, indent=2)
+            print()
+
+        problems = await check_role_counts(conn)
+        print(f"{'role counts (triggers)':<24} {'':>11}  {'ok' if not problems else 'FAIL'}")
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        failures += bool(problems)
+    finally:
+        await conn.close()
+
+    return 1 if failures else 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT, uvicorn_client
+from bench.fixture import create_database, embedded_postgres, seed_users
+
+EXPORT_BUDGET_MB = float(os.getenv("BENCH_EXPORT_BUDGET_MB", "64"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.export",
+        description="Stream GET /users/export over a large table and check the server's memory stays flat",
+    )
+    parser.add_argument("formats", nargs="*", default=["ndjson", "csv"], help="export formats (default: both)")
+    parser.add_argument("--users", type=int, default=1000000, help="users seeded before the run")
+    parser.add_argument("--database", default="bench_export", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    parser.add_argument("--budget-mb", type=float, default=EXPORT_BUDGET_MB, help="allowed server RSS growth")
+    return parser.parse_args()
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"no VmRSS for pid {pid}")
+
+
+async def export(client, export_format: str, pid: int) -> dict:
+    peak = baseline = rss_mb(pid)
+    rows = size = 0
+    first_byte = None
+    start = time.perf_counter()
+    async with client.stream("GET", "/users/export", params={"format": export_format}, timeout=None) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            rows += chunk.count(b"\n")
+            size += len(chunk)
+            peak = max(peak, rss_mb(pid))
+    elapsed = time.perf_counter() - start
+    if export_format == "csv":
+        rows -= 1
+    return {
+        "rows": rows,
+        "mb": size / 2**20,
+        "seconds": elapsed,
+        "first_byte_ms": (first_byte or elapsed) * 1000,
+        "baseline_mb": baseline,
+        "growth_mb": peak - baseline,
+    }
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    from src.sql.user_sql import user_table_schema
+
+    seeded = await seed_users(args.database, user_table_schema, args.users)
+    active = len(seeded["ids"])
+    del seeded
+
+    failures = 0
+    print(f"{'format':<8} {'rows':>9} {'MB':>8} {'rows/s':>9} {'TTFB ms':>8} {'RSS MB':>8} {'growth':>8}")
+    async with uvicorn_client(1) as client:
+        for export_format in args.formats:
+            result = await export(client, export_format, client.server_pid)
+            problems = []
+            if result["rows"] != active:
+                problems.append(f"streamed {result['rows']} rows, expected {active}")
+            if result["growth_mb"] > args.budget_mb:
+                problems.append(f"RSS grew {result['growth_mb']:.1f} MB, budget {args.budget_mb:.0f} MB")
+            print(
+                f"{export_format:<8} {result['rows']:>9} {result['mb']:>8.1f} {result['rows'] / result['seconds']:>9.0f} "
+                f"{result['first_byte_ms']:>8.1f} {result['baseline_mb']:>8.1f} {result['growth_mb']:>7.1f}M  "
+                f"{'ok' if not problems else 'FAIL'}"
+            )
+            for problem in problems:
+                print(f"REGRESSION export {export_format}: {problem}", file=sys.stderr)
+            failures += bool(problems)
+    return 1 if failures else 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
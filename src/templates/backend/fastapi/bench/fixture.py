@@ -0,0 +1,101 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import asyncpg
+import bcrypt
+
+BENCH_PASSWORD = "benchmark-password"
+TRIGRAM_FRAGMENTS = (
+    ("CREATE EXTENSION IF NOT EXISTS pg_trgm;", ""),
+    (" gin_trgm_ops", ""),
+    ("USING GIN (email", "(email"),
+    ("USING GIN (username", "(username"),
+    ("USING GIN (full_name", "(full_name"),
+)
+
+SEED_USERS = """
+    INSERT INTO users (email, username, full_name, password, bio, role, is_active, created_at, updated_at)
+    SELECT 'user' || i || '@example.com',
+           'user' || i,
+           'Bench User ' || i,
+           $1,
+           'Seeded user number ' || i,
+           CASE WHEN i % 50 = 0 THEN 'admin' ELSE 'user' END,
+           i % 20 <> 0,
+           now() AT TIME ZONE 'utc' - i * interval '1 second',
+           now() AT TIME ZONE 'utc' - i * interval '1 second'
+    FROM generate_series(1, $2) AS i
+"""
+
+
+def database_url(name: str) -> str:
+    return (
+        f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+        f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{name}"
+    )
+
+
+@contextmanager
+def embedded_postgres():
+    import pgserver
+
+    data_dir = tempfile.mkdtemp(prefix="bench-pg-")
+    server = pgserver.get_server(data_dir, cleanup_mode="delete")
+    os.environ.update(
+        DB_USER="postgres",
+        DB_PASSWORD="",
+        DB_HOST=quote(data_dir, safe=""),
+        DB_PORT="5432",
+        DB_NAME="postgres",
+    )
+    try:
+        yield server
+    finally:
+        server.cleanup()
+
+
+async def create_database(name: str):
+    conn = await asyncpg.connect(database_url(os.getenv("DB_NAME", "postgres")))
+    try:
+        exists = await conn.fetchval("SELECT 1 FROM pg_database WHERE datname = $1", name)
+        if not exists:
+            await conn.execute(f'CREATE DATABASE "{name}"')
+    finally:
+        await conn.close()
+
+
+def schema_without_trigrams(schema: str) -> str:
+    for fragment, replacement in TRIGRAM_FRAGMENTS:
+        schema = schema.replace(fragment, replacement)
+    return schema
+
+
+async def seed_users(name: str, schema: str, count: int) -> dict:
+    conn = await asyncpg.connect(database_url(name))
+    try:
+        await conn.execute("DROP TABLE IF EXISTS users CASCADE")
+        trigrams = True
+        try:
+            await conn.execute(schema)
+        except (asyncpg.FeatureNotSupportedError, asyncpg.UndefinedFileError):
+            trigrams = False
+            await conn.execute("DROP TABLE IF EXISTS users CASCADE")
+            await conn.execute(schema_without_trigrams(schema))
+
+        # Generated server side so million-row fixtures do not pass through Python.
+        hashed = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt(4)).decode("utf-8")
+        await conn.execute(SEED_USERS, hashed, count)
+        await conn.execute("ANALYZE users")
+        ids = [record["id"] for record in await conn.fetch("SELECT id FROM users WHERE is_active = true ORDER BY id")]
+    finally:
+        await conn.close()
+
+    return {"ids": ids, "count": count, "trigrams": trigrams}
+
+
+def memory_users(count: int) -> dict:
+    # Mirrors the rows UserStore.seed() creates when the app starts with MEMORY_STORE_SEED.
+    ids = [i for i in range(1, count + 1) if i % 20 != 0]
+    return {"ids": ids, "count": count, "trigrams": True}
@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT, asgi_client
+from bench.fixture import create_database, embedded_postgres, seed_users
+from bench.report import summarize
+from bench.scenarios import unique_user
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.hashing",
+        description="Measure GET /users/{id} latency while signups hash passwords, inline vs on the hash pool",
+    )
+    parser.add_argument("--users", type=int, default=10000, help="users seeded before the run")
+    parser.add_argument("--readers", type=int, default=16, help="concurrent GET /users/{id} clients")
+    parser.add_argument("--signups", type=int, default=8, help="concurrent POST /users/ clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per mode")
+    parser.add_argument("--database", default="bench_users", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    return parser.parse_args()
+
+
+async def inline_submit(operation: str, fn, *args):
+    # What user_sql did before the hash pool: bcrypt on the event loop thread.
+    return fn(*args)
+
+
+async def drive(client, ids: list, readers: int, signups: int, duration: float):
+    reads = []
+    statuses = {}
+    created = 0
+    deadline = time.perf_counter() + duration
+
+    async def reader():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(f"/users/{random.choice(ids)}")
+            reads.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def signer():
+        nonlocal created
+        while time.perf_counter() < deadline:
+            response = await client.post("/users/", json=unique_user())
+            if response.status_code == 201:
+                created += 1
+            else:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(reader() for _ in range(readers)), *(signer() for _ in range(signups)))
+    elapsed = time.perf_counter() - start
+    return summarize(reads, 0, elapsed), created / elapsed, statuses
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    from src.function.hasher import password_hasher
+    from src.service.user_service import user_service
+    from src.sql.user_sql import user_table_schema
+
+    seeded = await seed_users(args.database, user_table_schema, args.users)
+
+    print(f"bcrypt rounds {password_hasher.rounds}, {password_hasher.executor_type} pool of {password_hasher.workers}")
+    print(f"{'mode':<8} {'reads/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'signups/s':>10}  statuses")
+    async with asgi_client(args.readers + args.signups) as client:
+        for mode in ("inline", "pool"):
+            if mode == "inline":
+                password_hasher._submit = inline_submit
+            else:
+                del password_hasher._submit
+            await user_service.cache.clear()
+            await drive(client, seeded["ids"], args.readers, args.signups, 1.0)
+            summary, signups, statuses = await drive(client, seeded["ids"], args.readers, args.signups, args.duration)
+            print(
+                f"{mode:<8} {summary['throughput']:>8.0f} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} "
+                f"{summary['p99_ms']:>8.2f} {signups:>10.1f}  {statuses}"
+            )
+    return 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sys
+import time
+
+from bench.drivers import PROJECT_ROOT
+
+sys.path.insert(0, str(PROJECT_ROOT))
+os.environ["METRICS_ENABLED"] = "true"
+
+from src.function.metrics import MetricsMiddleware, instrument_query, render_metrics  # noqa: E402
+
+
+class Route:
+    path = "/users/{user_id}"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def discard(message):
+    pass
+
+
+async def get_user_by_id(user_id: int):
+    return {"id": user_id}
+
+
+async def get_users(limit: int):
+    return [None] * limit
+
+
+def request() -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/users/42",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+    }
+
+
+async def per_request(app, number: int) -> float:
+    scope = request()
+    start = time.perf_counter()
+    for _ in range(number):
+        await app(dict(scope), None, discard)
+    return (time.perf_counter() - start) / number * 1e6
+
+
+async def per_query(fn, number: int, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        await fn(*args)
+    return (time.perf_counter() - start) / number * 1e6
+
+
+async def main():
+    number = 100000
+    middleware = MetricsMiddleware(endpoint)
+
+    print(f"{'case':<24} {'off us':>8} {'on us':>8} {'overhead':>9}")
+    cases = [
+        ("request middleware", per_request(endpoint, number), per_request(middleware, number)),
+        (
+            "query, one row",
+            per_query(get_user_by_id, number, 42),
+            per_query(instrument_query(get_user_by_id), number, 42),
+        ),
+        (
+            "query, 50 rows",
+            per_query(get_users, number, 50),
+            per_query(instrument_query(get_users), number, 50),
+        ),
+    ]
+    for name, off, on in cases:
+        off, on = await off, await on
+        print(f"{name:<24} {off:>8.2f} {on:>8.2f} {on - off:>8.2f}us")
+
+    start = time.perf_counter()
+    body = render_metrics()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"GET /metrics render: {elapsed:.2f} ms for {len(body.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT
+from bench.fixture import create_database, embedded_postgres, seed_users
+from bench.report import summarize
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m bench.outbox", description="Measure write latency added by the user event outbox")
+    parser.add_argument("--users", type=int, default=10000, help="users seeded before the run")
+    parser.add_argument("--writes", type=int, default=2000, help="statements per operation and mode")
+    parser.add_argument("--relay", action="store_true", help="run the outbox relay with a queue sink during the event writes")
+    parser.add_argument("--database", default="bench_outbox", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    return parser.parse_args()
+
+
+def operations(statements, password: str, ids: list) -> dict:
+    counter = iter(range(10**9))
+
+    def insert():
+        n = next(counter)
+        return (f"outbox{n}@example.com", f"outbox{n}", "Outbox User", password, None, None, "user")
+
+    def user_id():
+        return (ids[next(counter) % len(ids)],)
+
+    def update():
+        return ("Renamed User", ids[next(counter) % len(ids)])
+
+    return {
+        "insert": (statements.INSERT_USER, statements.INSERT_USER_WITH_EVENT, insert),
+        "update": (
+            statements.update_user_statement(("full_name",)),
+            statements.update_user_with_event_statement(("full_name",)),
+            update,
+        ),
+        "soft delete": (statements.SOFT_DELETE_USER, statements.SOFT_DELETE_USER_WITH_EVENT, user_id),
+    }
+
+
+async def measure(conn, query: str, params, writes: int, relay=None) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(writes):
+        started = time.perf_counter()
+        await conn.fetchrow(query, *params())
+        latencies.append(time.perf_counter() - started)
+        if relay is not None:
+            relay.notify()
+            await asyncio.sleep(0)
+    return summarize(latencies, 0, time.perf_counter() - start)
+
+
+async def drain(queue: asyncio.Queue):
+    while True:
+        await queue.get()
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    from src.db import close_db, connect_db, get_db
+    from src.function.hasher import password_hasher
+    from src.function.outbox import OutboxRelay, QueueSink
+    from src.sql import statements
+    from src.sql.user_sql import user_table_schema
+
+    seeded = await seed_users(args.database, user_table_schema, args.users)
+    password = await password_hasher.hash("benchmark-password")
+    await connect_db()
+    relay = drainer = None
+    if args.relay:
+        sink = QueueSink()
+        relay = OutboxRelay(sink)
+        await relay.start()
+        drainer = asyncio.ensure_future(drain(sink.queue))
+
+    try:
+        async with get_db() as conn:
+            print(f"{'operation':<12} {'mode':<8} {'p50 ms':>8} {'p95 ms':>8} {'added p50 us':>13}")
+            for name, (plain, evented, params) in operations(statements, password, seeded["ids"]).items():
+                await measure(conn, plain, params, min(args.writes, 100))
+                await measure(conn, evented, params, min(args.writes, 100))
+                base = await measure(conn, plain, params, args.writes)
+                event = await measure(conn, evented, params, args.writes, relay)
+                added = (event["p50_ms"] - base["p50_ms"]) * 1000
+                print(f"{name:<12} {'plain':<8} {base['p50_ms']:>8.3f} {base['p95_ms']:>8.3f}")
+                print(f"{name:<12} {'outbox':<8} {event['p50_ms']:>8.3f} {event['p95_ms']:>8.3f} {added:>13.0f}")
+            pending = await conn.fetchval("SELECT count(*) FROM user_events")
+        if relay is not None:
+            print(f"\nrelay {relay.stats()}, {pending} events pending at the end of the run")
+    finally:
+        if relay is not None:
+            drainer.cancel()
+            await relay.stop()
+        await close_db()
+        password_hasher.shutdown()
+    return 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+from typing import Dict, List
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "ops": len(values),
+        "errors": errors,
+        "throughput": len(values) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+    }
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_baseline(results: Dict[str, dict], path: Path = BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline.update(results)
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def change(current: float, previous: float) -> str:
+    if not previous:
+        return "n/a"
+    return f"{(current - previous) / previous * 100:+.1f}%"
+
+
+def print_report(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    header = f"{'scenario':<16} {'ops':>7} {'err':>5} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  vs baseline"
+    print(header)
+    print("-" * len(header))
+
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        comparison = ""
+        if previous:
+            comparison = f"ops/s {change(result['throughput'], previous['throughput'])}, p95 {change(result['p95_ms'], previous['p95_ms'])}"
+            if result["throughput"] < previous["throughput"] * (1 - tolerance):
+                regressions.append(f"{key}: throughput {change(result['throughput'], previous['throughput'])}")
+            if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{key}: p95 {change(result['p95_ms'], previous['p95_ms'])}")
+
+        print(
+            f"{key:<16} {result['ops']:>7} {result['errors']:>5} {result['throughput']:>9.1f} "
+            f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}  {comparison}"
+        )
+
+    return regressions
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT, asgi_client
+from bench.fixture import create_database, embedded_postgres, seed_users
+from bench.report import summarize
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.responses",
+        description="Compare GET /users/ rendering through response_model vs orjson (FAST_RESPONSES)",
+    )
+    parser.add_argument("--rows", type=int, default=1000, help="users per page")
+    parser.add_argument("--users", type=int, default=10000, help="users seeded before the run")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per mode")
+    parser.add_argument("--database", default="bench_users", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    return parser.parse_args()
+
+
+async def drive(client, rows: int, duration: float):
+    latencies = []
+    size = 0
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/users/", params={"limit": rows})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        size = len(response.content)
+    return summarize(latencies, 0, time.perf_counter() - start), size
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    import src.function.response as response
+    from src.service.user_service import UserService
+    from src.sql.user_sql import user_table_schema
+
+    await seed_users(args.database, user_table_schema, args.users)
+    map_to_rows = UserService.map_to_rows
+
+    def copy_rows(self, users: list, fields=None) -> list:
+        # What list pages did before user-010: a map_to_response copy per row.
+        return [self.map_to_response(user, fields) for user in users]
+
+    print(f"{'mode':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'bytes':>9}")
+    async with asgi_client(1) as client:
+        for mode in ("old", "new"):
+            response.FAST_RESPONSES = mode == "new"
+            UserService.map_to_rows = map_to_rows if mode == "new" else copy_rows
+            await drive(client, args.rows, 1.0)
+            summary, size = await drive(client, args.rows, args.duration)
+            print(
+                f"{mode:<8} {summary['throughput']:>8.1f} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} "
+                f"{summary['p99_ms']:>8.2f} {size:>9}"
+            )
+    UserService.map_to_rows = map_to_rows
+    return 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    args = parse_args()
+    os.environ["USERS_PAGE_MAX"] = str(max(args.rows, int(os.getenv("USERS_PAGE_MAX", "200"))))
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
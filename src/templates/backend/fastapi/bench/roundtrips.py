@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT
+from bench.fixture import create_database, embedded_postgres, seed_users
+from bench.report import summarize
+from bench.scenarios import unique_user
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.roundtrips",
+        description="Count statements and latency of the user write paths, check-then-write vs single statement",
+    )
+    parser.add_argument("--users", type=int, default=10000, help="users seeded before the run")
+    parser.add_argument("--operations", type=int, default=500, help="calls per path and mode")
+    parser.add_argument("--database", default="bench_users", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    return parser.parse_args()
+
+
+class QueryCounter:
+    """Query logger counting every statement a pooled connection sends, pool resets included."""
+
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, record):
+        self.queries += 1
+
+
+def counting_connection(base, counter: QueryCounter):
+    class CountingConnection(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.add_query_logger(counter)
+
+    return CountingConnection
+
+
+class LegacyWrites:
+    """The write paths before user-007: a pre-read per uniqueness or existence check."""
+
+    def __init__(self, sql):
+        self.sql = sql
+
+    async def create_user(self, data):
+        if await self.sql.get_user_by_email(data.email):
+            raise ValueError("User with this email already exists")
+        if await self.sql.get_user_by_username(data.username):
+            raise ValueError("Username already taken")
+        return await self.sql.create_user(data)
+
+    async def update_user(self, user_id: int, data):
+        if not await self.sql.get_user_by_id(user_id):
+            raise ValueError("User not found")
+        if data.email and await self.sql.get_user_by_email(data.email):
+            raise ValueError("Email already in use")
+        if data.username and await self.sql.get_user_by_username(data.username):
+            raise ValueError("Username already taken")
+        return await self.sql.update_user(user_id, data)
+
+    async def soft_delete_user(self, user_id: int):
+        if not await self.sql.get_user_by_id(user_id):
+            raise ValueError("User not found")
+        return await self.sql.soft_delete_user(user_id)
+
+    async def delete_user(self, user_id: int):
+        if not await self.sql.get_user_by_id(user_id):
+            raise ValueError("User not found")
+        return await self.sql.delete_user(user_id)
+
+
+async def measure(operation, operations: int, counter: QueryCounter):
+    latencies = []
+    before = counter.queries
+    start = time.perf_counter()
+    for _ in range(operations):
+        started = time.perf_counter()
+        await operation()
+        latencies.append(time.perf_counter() - started)
+    summary = summarize(latencies, 0, time.perf_counter() - start)
+    summary["queries"] = (counter.queries - before) / operations
+    return summary
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    import src.db as db
+    import src.sql.user_sql as user_sql
+    from src.function.hasher import password_hasher
+    from src.service.user_service import user_service
+    from src.types.user_type import CreateUserDto, UpdateUserDto
+
+    seeded = await seed_users(args.database, user_sql.user_table_schema, args.users)
+    counter = QueryCounter()
+    db.PreparedConnection = counting_connection(db.PreparedConnection, counter)
+    await db.connect_db()
+    password_hasher.start()
+
+    ids = list(seeded["ids"])
+    random.shuffle(ids)
+    legacy = LegacyWrites(user_sql)
+
+    def create(writer):
+        return lambda: writer.create_user(CreateUserDto(**unique_user()))
+
+    def update(writer):
+        return lambda: writer.update_user(random.choice(ids), UpdateUserDto(bio=f"updated {random.getrandbits(32)}"))
+
+    def soft_delete(writer):
+        return lambda: writer.soft_delete_user(random.choice(ids))
+
+    def delete(writer):
+        return lambda: writer.delete_user(ids.pop())
+
+    paths = (("create", create), ("update", update), ("soft delete", soft_delete), ("delete", delete))
+    print(f"bcrypt rounds {password_hasher.rounds}")
+    print(f"{'path':<12} {'mode':<8} {'stmt/op':>8} {'p50 ms':>8} {'p95 ms':>8} {'ops/s':>8}")
+    try:
+        for name, build in paths:
+            for mode, writer in (("before", legacy), ("after", user_service)):
+                summary = await measure(build(writer), args.operations, counter)
+                print(
+                    f"{name:<12} {mode:<8} {summary['queries']:>8.2f} {summary['p50_ms']:>8.2f} "
+                    f"{summary['p95_ms']:>8.2f} {summary['throughput']:>8.0f}"
+                )
+    finally:
+        password_hasher.shutdown()
+        await db.close_db()
+    return 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    # Hashing is the same on both paths; keep it cheap so round trips dominate.
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
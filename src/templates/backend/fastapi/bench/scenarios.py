@@ -0,0 +1,92 @@
+import itertools
+import random
+
+SEARCH_TERMS = ("user1", "bench user 4", "number 7", "user99")
+
+_unique = itertools.count()
+
+
+def unique_user() -> dict:
+    n = next(_unique)
+    return {
+        "email": f"bench-{n}-{random.getrandbits(32)}@example.com",
+        "username": f"bench_{n}_{random.getrandbits(32)}",
+        "full_name": f"Signup {n}",
+        "password": "benchmark-password",
+    }
+
+
+def expect(response, *codes):
+    if response.status_code not in codes:
+        raise AssertionError(f"{response.request.method} {response.request.url.path} -> {response.status_code}")
+
+
+async def read_user(client, state: dict):
+    response = await client.get(f"/users/{random.choice(state['ids'])}")
+    expect(response, 200)
+
+
+async def list_users(client, state: dict):
+    params = {"limit": 50}
+    cursor = state.get("cursor")
+    if cursor:
+        params["cursor"] = cursor
+    response = await client.get("/users/", params=params)
+    expect(response, 200)
+    state["cursor"] = response.json().get("next_cursor")
+
+
+async def search_users(client, state: dict):
+    response = await client.get(
+        f"/users/search/{random.choice(SEARCH_TERMS)}",
+        params={"mode": random.choice(state["search_modes"]), "limit": 20},
+    )
+    expect(response, 200)
+
+
+async def signup(client, state: dict):
+    response = await client.post("/users/", json=unique_user())
+    expect(response, 201)
+
+
+async def update_user(client, state: dict):
+    response = await client.put(
+        f"/users/{random.choice(state['ids'])}",
+        json={"bio": f"updated {random.getrandbits(32)}"},
+    )
+    expect(response, 200)
+
+
+async def create_and_delete(client, state: dict):
+    response = await client.post("/users/", json=unique_user())
+    expect(response, 201)
+    response = await client.delete(f"/users/{response.json()['data']['id']}")
+    expect(response, 200)
+
+
+MIXED_WEIGHTS = (
+    (read_user, 60),
+    (list_users, 15),
+    (search_users, 10),
+    (update_user, 10),
+    (create_and_delete, 5),
+)
+
+
+async def mixed_crud(client, state: dict):
+    operation = random.choices(
+        [operation for operation, _ in MIXED_WEIGHTS],
+        weights=[weight for _, weight in MIXED_WEIGHTS],
+    )[0]
+    await operation(client, state)
+
+
+SCENARIOS = {
+    "read": read_user,
+    "list": list_users,
+    "search": search_users,
+    "signup": signup,
+    "update": update_user,
+    "create_delete": create_and_delete,
+    "mixed": mixed_crud,
+}
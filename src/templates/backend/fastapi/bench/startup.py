@@ -0,0 +1,106 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT, free_port
+
+IMPORT_BUDGET_MS = float(os.getenv("BENCH_IMPORT_BUDGET_MS", "1500"))
+FIRST_RESPONSE_BUDGET_MS = float(os.getenv("BENCH_FIRST_RESPONSE_BUDGET_MS", "3000"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m bench.startup", description="Measure cold start of the app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--first-response-budget-ms", type=float, default=FIRST_RESPONSE_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest project modules to list")
+    return parser.parse_args()
+
+
+def parse_importtime(stderr: str) -> dict:
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+        modules[name] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure_import() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        cwd=PROJECT_ROOT,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_first_response(timeout: float = 30.0) -> float:
+    port = free_port()
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT,
+        env=os.environ.copy(),
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started_at + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started_at
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("uvicorn did not answer /health in time")
+    finally:
+        process.terminate()
+        process.wait(timeout=15)
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    load_dotenv()
+    args = parse_args()
+
+    import_runs = [measure_import() for _ in range(args.runs)]
+    import_ms = statistics.median(run["src.main"][1] for run in import_runs) / 1000
+    first_response_ms = statistics.median(measure_first_response() for _ in range(args.runs)) * 1000
+
+    print(f"import src.main      {import_ms:8.1f} ms  (budget {args.import_budget_ms:.0f} ms)")
+    print(f"time to first /health {first_response_ms:7.1f} ms  (budget {args.first_response_budget_ms:.0f} ms)")
+
+    project_modules = sorted(
+        ((name, self_us) for name, (self_us, _) in import_runs[-1].items() if name.startswith("src")),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    print("\nslowest project modules (self time):")
+    for name, self_us in project_modules[:args.top]:
+        print(f"  {self_us / 1000:8.2f} ms  {name}")
+
+    failed = False
+    if import_ms > args.import_budget_ms:
+        print(f"BUDGET EXCEEDED import src.main: {import_ms:.1f} ms", file=sys.stderr)
+        failed = True
+    if first_response_ms > args.first_response_budget_ms:
+        print(f"BUDGET EXCEEDED first response: {first_response_ms:.1f} ms", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
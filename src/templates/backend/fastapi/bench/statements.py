@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT, asgi_client
+from bench.fixture import create_database, embedded_postgres, seed_users
+from bench.report import summarize
+
+UPDATE_VALUES = {
+    "full_name": lambda: f"Renamed {random.getrandbits(24)}",
+    "bio": lambda: f"updated {random.getrandbits(32)}",
+    "avatar_url": lambda: f"https://example.com/{random.getrandbits(32)}.png",
+    "role": lambda: random.choice(("user", "admin", "editor")),
+}
+
+# Every non-empty combination of the fields above, so each PUT picks one of 15 UPDATE statements.
+UPDATE_SHAPES = [
+    shape for size in range(1, len(UPDATE_VALUES) + 1) for shape in itertools.combinations(UPDATE_VALUES, size)
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.statements",
+        description="Compare mixed PUT /users/{id} throughput with the statement cache off and at its configured size",
+    )
+    parser.add_argument("--users", type=int, default=10000, help="users seeded before the run")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per mode")
+    parser.add_argument("--database", default="bench_users", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    return parser.parse_args()
+
+
+async def drive(client, ids: list, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            body = {field: UPDATE_VALUES[field]() for field in random.choice(UPDATE_SHAPES)}
+            start = time.perf_counter()
+            response = await client.put(f"/users/{random.choice(ids)}", json=body)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    import src.db as db
+    from src.sql.user_sql import user_table_schema
+
+    seeded = await seed_users(args.database, user_table_schema, args.users)
+    default_size = db.DB_STATEMENT_CACHE_SIZE
+
+    print(f"{'cache':>6} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'err':>5} {'hits':>8} {'misses':>8}")
+    for size in (0, default_size):
+        db.DB_STATEMENT_CACHE_SIZE = size
+        async with asgi_client(args.concurrency) as client:
+            await drive(client, seeded["ids"], args.concurrency, 1.0)
+            before = dict(db.prepare_stats)
+            summary = await drive(client, seeded["ids"], args.concurrency, args.duration)
+            hits = db.prepare_stats["hits"] - before["hits"]
+            misses = db.prepare_stats["misses"] - before["misses"]
+        print(
+            f"{size:>6} {summary['throughput']:>8.0f} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} "
+            f"{summary['p99_ms']:>8.2f} {summary['errors']:>5} {hits:>8} {misses:>8}"
+        )
+    db.DB_STATEMENT_CACHE_SIZE = default_size
+    return 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+from dotenv import load_dotenv
+
+from bench.drivers import PROJECT_ROOT, asgi_client
+from bench.fixture import create_database, embedded_postgres, seed_users
+from bench.report import summarize
+from bench.scenarios import expect, list_users, mixed_crud, read_user, update_user
+
+
+async def revalidate_list(client, state: dict):
+    response = await client.get("/users/", params={"limit": 50}, headers={"If-None-Match": 'W/"stale"'})
+    expect(response, 200)
+
+
+async def read_uncached(client, state: dict):
+    response = await client.get("/users/search/user1", params={"mode": "prefix", "limit": 20})
+    expect(response, 200)
+
+
+SCENARIOS = {
+    "read": read_user,
+    "search": read_uncached,
+    "list": list_users,
+    "revalidate": revalidate_list,
+    "update": update_user,
+    "mixed": mixed_crud,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.transactions",
+        description="Compare connection acquisitions and throughput with and without request transactions",
+    )
+    parser.add_argument("scenarios", nargs="*", help=f"any of: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--users", type=int, default=10000, help="users seeded before the run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="measured seconds per scenario and mode")
+    parser.add_argument("--database", default="bench_users", help="database created and seeded for the run")
+    parser.add_argument("--embedded", action="store_true", help="start a throwaway Postgres via pgserver")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    return args
+
+
+async def drive(client, scenario, state: dict, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await scenario(client, state)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run(args) -> int:
+    await create_database(args.database)
+    os.environ["DB_NAME"] = args.database
+
+    import src.db as db
+    from src.service.user_service import user_service
+    from src.sql.user_sql import user_table_schema
+
+    seeded = await seed_users(args.database, user_table_schema, args.users)
+    state = {
+        "ids": seeded["ids"],
+        "search_modes": ["contains", "prefix", "fuzzy", "fulltext"] if seeded["trigrams"] else ["prefix", "fulltext"],
+    }
+
+    print(f"{'scenario':<12} {'mode':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'acq/req':>8} {'errors':>7}")
+    async with asgi_client(args.concurrency) as client:
+        for name in args.scenarios:
+            for mode, enabled in (("off", False), ("request", True)):
+                db.DB_REQUEST_TRANSACTIONS = enabled
+                await user_service.cache.clear()
+                random.seed(0)
+                await drive(client, SCENARIOS[name], state, args.concurrency, 1.0)
+                before = db.transaction_stats["acquisitions"]
+                summary = await drive(client, SCENARIOS[name], state, args.concurrency, args.duration)
+                acquired = db.transaction_stats["acquisitions"] - before
+                per_request = acquired / max(summary["ops"] + summary["errors"], 1)
+                print(
+                    f"{name:<12} {mode:<8} {summary['throughput']:>8.0f} {summary['p50_ms']:>8.2f} "
+                    f"{summary['p95_ms']:>8.2f} {per_request:>8.2f} {summary['errors']:>7}"
+                )
+    return 0
+
+
+def main() -> int:
+    os.chdir(PROJECT_ROOT)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    load_dotenv()
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    args = parse_args()
+
+    with ExitStack() as stack:
+        if args.embedded:
+            stack.enter_context(embedded_postgres())
+        return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import re
+import sys
+import timeit
+
+from bench.drivers import PROJECT_ROOT
+
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.function.helper import validate_create_user_dto, validate_string, validate_update_user_dto  # noqa: E402
+from src.types.user_type import CreateUserDto, UpdateUserDto  # noqa: E402
+
+CREATE_PAYLOAD = {
+    "email": "Jane.Doe@Example.com",
+    "username": "janedoe",
+    "full_name": "Jane Doe",
+    "password": "correct-horse",
+    "bio": "Writes benchmarks",
+}
+UPDATE_PAYLOAD = {"bio": "Updated bio", "is_active": True}
+INVALID_PAYLOAD = {"email": "not-an-email", "username": "x", "password": "123"}
+
+
+def legacy_validate_email(email: str) -> bool:
+    email_regex = r"^[^\s@]+@[^\s@]+\.[^\s@]+$"
+    return re.match(email_regex, email) is not None
+
+
+def legacy_validate_create_user_dto(data: dict) -> CreateUserDto:
+    errors = []
+    if not legacy_validate_email(data.get("email", "")):
+        errors.append("Invalid email format")
+    if not validate_string(data.get("username"), 3, 100):
+        errors.append("Username must be between 3 and 100 characters")
+    if not validate_string(data.get("full_name"), 1, 255):
+        errors.append("Full name must be between 1 and 255 characters")
+    if not validate_string(data.get("password"), 6, 255):
+        errors.append("Password must be at least 6 characters")
+    for key, limit in (("avatar_url", 1000), ("bio", 1000), ("role", 50)):
+        value = data.get(key)
+        if value is not None and not validate_string(value, 1, limit):
+            errors.append(f"{key} must be a valid string")
+    if errors:
+        raise ValueError(f"Validation error: {', '.join(errors)}")
+    return CreateUserDto(
+        email=data["email"],
+        username=data["username"],
+        full_name=data["full_name"],
+        password=data["password"],
+        avatar_url=data.get("avatar_url"),
+        bio=data.get("bio"),
+        role=data.get("role") or "user",
+    )
+
+
+def legacy_validate_update_user_dto(data: dict) -> UpdateUserDto:
+    errors = []
+    email = data.get("email")
+    if email is not None and not legacy_validate_email(email):
+        errors.append("Invalid email format")
+    for key, low, high in (("username", 3, 100), ("full_name", 1, 255), ("password", 6, 255),
+                           ("avatar_url", 1, 1000), ("bio", 1, 1000), ("role", 1, 50)):
+        value = data.get(key)
+        if value is not None and not validate_string(value, low, high):
+            errors.append(f"{key} is invalid")
+    is_active = data.get("is_active")
+    if is_active is not None and not isinstance(is_active, bool):
+        errors.append("is_active must be a boolean")
+    if errors:
+        raise ValueError(f"Validation error: {', '.join(errors)}")
+    return UpdateUserDto(**{key: data.get(key) for key in UpdateUserDto.model_fields})
+
+
+def rejecting(validator):
+    def run():
+        try:
+            validator(INVALID_PAYLOAD)
+        except ValueError:
+            pass
+    return run
+
+
+def rate(fn, number: int) -> float:
+    return number / min(timeit.repeat(fn, number=number, repeat=5))
+
+
+def main():
+    number = 20000
+    batch = [CREATE_PAYLOAD] * 1000
+    cases = [
+        ("create", lambda: legacy_validate_create_user_dto(CREATE_PAYLOAD), lambda: validate_create_user_dto(CREATE_PAYLOAD)),
+        ("update", lambda: legacy_validate_update_user_dto(UPDATE_PAYLOAD), lambda: validate_update_user_dto(UPDATE_PAYLOAD)),
+        ("invalid", rejecting(legacy_validate_create_user_dto), rejecting(validate_create_user_dto)),
+        (
+            "batch x1000",
+            lambda: [legacy_validate_create_user_dto(payload) for payload in batch],
+            lambda: validate_create_user_dto.many(batch),
+        ),
+    ]
+
+    print(f"{'case':<12} {'legacy/s':>12} {'compiled/s':>12} {'speedup':>8}")
+    for name, legacy, compiled in cases:
+        runs = number // 1000 if name.startswith("batch") else number
+        scale = 1000 if name.startswith("batch") else 1
+        before = rate(legacy, runs) * scale
+        after = rate(compiled, runs) * scale
+        print(f"{name:<12} {before:>12,.0f} {after:>12,.0f} {after / before:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
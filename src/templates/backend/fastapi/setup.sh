@@ -20,4 +20,4 @@ echo "To activate the virtual environment, run:"
 echo "  source venv/bin/activate"
 echo ""
 echo "To run the application:"
-echo "  python src/main.py"
+echo "  python -m src.server"
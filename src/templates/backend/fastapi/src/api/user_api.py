@@ -1,19 +1,81 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import logging
+import os
+from src.db import read_transaction, write_transaction
 from src.service.user_service import user_service
-from src.types.user_type import CreateUserDto, UpdateUserDto, ApiResponse
-from src.function.helper import validate_create_user_dto, validate_update_user_dto, validate_string
+from src.types.user_type import ApiResponse
+from src.function.helper import (
+    validate_create_user_dto,
+    validate_update_user_dto,
+    validate_string,
+    parse_fields,
+    parse_ids,
+    iter_upload_rows,
+)
+from src.function.hasher import HasherBusyError
+from src.function.profiling import TimedRoute
+from src.function.response import respond
+from src.function.conditional import is_conditional, page_validators, user_validators
 
-router = APIRouter(prefix="/users", tags=["Users"])
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "50"))
+USERS_PAGE_MAX = int(os.getenv("USERS_PAGE_MAX", "200"))
+USERS_EXPORT_PREFETCH = int(os.getenv("USERS_EXPORT_PREFETCH", "1000"))
+USERS_BATCH_MAX = int(os.getenv("USERS_BATCH_MAX", "100"))
+USERS_LIST_CACHE_CONTROL = os.getenv("USERS_LIST_CACHE_CONTROL", "private, no-cache")
+USERS_ITEM_CACHE_CONTROL = os.getenv("USERS_ITEM_CACHE_CONTROL", "private, no-cache")
 
+logger = logging.getLogger(__name__)
 
-@router.get("/", response_model=ApiResponse)
-async def get_all_users():
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Function scope closes the transaction before the response is sent, so a failed
+# commit is reported to the client instead of after a 2xx.
+READ_TRANSACTION = Depends(read_transaction, scope="function")
+WRITE_TRANSACTION = Depends(write_transaction, scope="function")
+
+router = APIRouter(prefix="/users", tags=["Users"], route_class=TimedRoute)
+
+
+@router.get(
+    "/",
+    response_model=ApiResponse,
+    dependencies=[READ_TRANSACTION],
+)
+async def get_all_users(
+    request: Request,
+    response: Response,
+    limit: int = Query(USERS_PAGE_SIZE, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     try:
-        users = await user_service.get_all_users()
-        return ApiResponse(
-            success=True,
-            data=users,
-            message="Users retrieved successfully",
+        limit = min(limit, USERS_PAGE_MAX)
+        selected = parse_fields(fields)
+        validators = None
+        if is_conditional(request):
+            validators = page_validators(*await user_service.get_user_page_versions(limit, cursor), USERS_LIST_CACHE_CONTROL)
+            if validators.matches(request):
+                return validators.not_modified()
+
+        users, next_cursor, versions = await user_service.get_all_users(limit, cursor, selected)
+        if validators is None:
+            validators = page_validators(*versions, USERS_LIST_CACHE_CONTROL)
+
+        return validators.apply(
+            respond(
+                ApiResponse(
+                    success=True,
+                    data=users,
+                    message="Users retrieved successfully",
+                    next_cursor=next_cursor,
+                )
+            ),
+            response,
         )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -21,20 +83,80 @@ async def get_all_users():
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-@router.get("/{user_id}", response_model=ApiResponse)
-async def get_user_by_id(user_id: int):
+@router.get("/export")
+async def export_users(export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")):
+    return StreamingResponse(
+        user_service.export_users(export_format, USERS_EXPORT_PREFETCH),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename=users.{export_format}"},
+    )
+
+
+@router.get("/batch", response_model=ApiResponse, dependencies=[READ_TRANSACTION])
+async def get_users_batch(ids: str):
+    try:
+        result = await user_service.get_users_by_ids(parse_ids(ids, USERS_BATCH_MAX))
+        return respond(
+            ApiResponse(
+                success=True,
+                data=result,
+                message="Users retrieved successfully",
+            )
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post("/batch", response_model=ApiResponse, dependencies=[READ_TRANSACTION])
+async def post_users_batch(data: dict):
+    ids = data.get("ids")
+    if not isinstance(ids, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be a list of user IDs")
+    return await get_users_batch(",".join(str(user_id) for user_id in ids))
+
+
+@router.get("/roles", response_model=ApiResponse, dependencies=[READ_TRANSACTION])
+async def get_user_role_counts():
+    try:
+        return respond(
+            ApiResponse(
+                success=True,
+                data=await user_service.count_users_by_role(),
+                message="Role counts retrieved successfully",
+            )
+        )
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/{user_id}", response_model=ApiResponse, dependencies=[READ_TRANSACTION])
+async def get_user_by_id(user_id: int, request: Request, response: Response):
     try:
         if user_id <= 0:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID")
 
+        if is_conditional(request):
+            updated_at = await user_service.get_user_version(user_id)
+            if updated_at is not None:
+                validators = user_validators(user_id, updated_at, USERS_ITEM_CACHE_CONTROL)
+                if validators.matches(request):
+                    return validators.not_modified()
+
         user = await user_service.get_user_by_id(user_id)
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-        return ApiResponse(
-            success=True,
-            data=user,
-            message="User retrieved successfully",
+        return user_validators(user_id, user["updated_at"], USERS_ITEM_CACHE_CONTROL).apply(
+            respond(
+                ApiResponse(
+                    success=True,
+                    data=user,
+                    message="User retrieved successfully",
+                )
+            ),
+            response,
         )
     except HTTPException:
         raise
@@ -42,33 +164,53 @@ async def get_user_by_id(user_id: int):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-@router.get("/search/{keyword}", response_model=ApiResponse)
-async def search_users(keyword: str):
+@router.get(
+    "/search/{keyword}",
+    response_model=ApiResponse,
+    dependencies=[READ_TRANSACTION],
+)
+async def search_users(
+    keyword: str,
+    mode: str = Query("contains", pattern="^(contains|prefix|fuzzy|fulltext)$"),
+    limit: int = Query(USERS_PAGE_SIZE, ge=1),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     try:
         if not validate_string(keyword, 1, 100):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search keyword must be between 1 and 100 characters")
 
-        users = await user_service.search_users(keyword)
-        return ApiResponse(
-            success=True,
-            data=users,
-            message="Users retrieved successfully",
+        users, next_cursor = await user_service.search_users(
+            keyword, min(limit, USERS_PAGE_MAX), cursor, parse_fields(fields), mode
+        )
+        return respond(
+            ApiResponse(
+                success=True,
+                data=users,
+                message="Users retrieved successfully",
+                next_cursor=next_cursor,
+            )
         )
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-@router.post("/", response_model=ApiResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=ApiResponse, status_code=status.HTTP_201_CREATED, dependencies=[WRITE_TRANSACTION])
 async def create_user(data: dict):
     try:
         validated_data = validate_create_user_dto(data)
         user = await user_service.create_user(validated_data)
-        return ApiResponse(
-            success=True,
-            data=user,
-            message="User created successfully",
+        return respond(
+            ApiResponse(
+                success=True,
+                data=user,
+                message="User created successfully",
+            ),
+            status.HTTP_201_CREATED,
         )
     except ValueError as e:
         error_message = str(e)
@@ -76,11 +218,40 @@ async def create_user(data: dict):
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=error_message)
         else:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_message)
+    except HasherBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-@router.put("/{user_id}", response_model=ApiResponse)
+@router.post("/bulk", response_model=ApiResponse)
+async def bulk_create_users(
+    request: Request,
+    upload_format: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv)$"),
+):
+    try:
+        if upload_format is None:
+            upload_format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+        report = await user_service.bulk_create_users(iter_upload_rows(request.stream(), upload_format))
+        return respond(
+            ApiResponse(
+                success=report["failed"] == 0,
+                data=report,
+                message=f"Imported {report['inserted']} of {report['total']} users",
+            )
+        )
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Upload must be UTF-8 encoded")
+    except HasherBusyError as e:
+        # Batches already committed stay imported; a retry reports them as duplicates.
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+    except Exception:
+        logger.exception("Bulk import failed")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Bulk import failed")
+
+
+@router.put("/{user_id}", response_model=ApiResponse, dependencies=[WRITE_TRANSACTION])
 async def update_user(user_id: int, data: dict):
     try:
         if user_id <= 0:
@@ -91,10 +262,12 @@ async def update_user(user_id: int, data: dict):
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-        return ApiResponse(
-            success=True,
-            data=user,
-            message="User updated successfully",
+        return respond(
+            ApiResponse(
+                success=True,
+                data=user,
+                message="User updated successfully",
+            )
         )
     except ValueError as e:
         error_message = str(e)
@@ -104,13 +277,15 @@ async def update_user(user_id: int, data: dict):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_message)
         else:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_message)
+    except HasherBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-@router.delete("/{user_id}", response_model=ApiResponse)
+@router.delete("/{user_id}", response_model=ApiResponse, dependencies=[WRITE_TRANSACTION])
 async def delete_user(user_id: int):
     try:
         if user_id <= 0:
@@ -120,9 +295,11 @@ async def delete_user(user_id: int):
         if not deleted:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-        return ApiResponse(
-            success=True,
-            message="User deleted successfully",
+        return respond(
+            ApiResponse(
+                success=True,
+                message="User deleted successfully",
+            )
         )
     except ValueError as e:
         error_message = str(e)
@@ -136,7 +313,7 @@ async def delete_user(user_id: int):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-@router.post("/{user_id}/soft-delete", response_model=ApiResponse)
+@router.post("/{user_id}/soft-delete", response_model=ApiResponse, dependencies=[WRITE_TRANSACTION])
 async def soft_delete_user(user_id: int):
     try:
         if user_id <= 0:
@@ -146,10 +323,12 @@ async def soft_delete_user(user_id: int):
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-        return ApiResponse(
-            success=True,
-            data=user,
-            message="User soft deleted successfully",
+        return respond(
+            ApiResponse(
+                success=True,
+                data=user,
+                message="User soft deleted successfully",
+            )
         )
     except ValueError as e:
         error_message = str(e)
@@ -1,31 +1,473 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+import asyncio
+import inspect
+import itertools
 import os
+import time
+import weakref
+import asyncpg
+from src.function.metrics import db_pool_wait
+from src.function.profiling import record_phase, timed_phase
 
-DATABASE_URL = (
+DATABASE_URL = os.getenv("DB_PRIMARY_URL") or (
     f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
     f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}"
     f"/{os.getenv('DB_NAME')}"
 )
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_BALANCE = os.getenv("DB_REPLICA_BALANCE", "least_connections")
+DB_READ_YOUR_WRITES_WINDOW = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", "5"))
+DB_READ_YOUR_WRITES_COOKIE = os.getenv("DB_READ_YOUR_WRITES_COOKIE", "primary_until")
+DB_REPLICA_HEALTH_INTERVAL = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL", "5"))
+DB_REPLICA_HEALTH_TIMEOUT = float(os.getenv("DB_REPLICA_HEALTH_TIMEOUT", "2"))
+DB_REPLICA_MAX_FAILURES = int(os.getenv("DB_REPLICA_MAX_FAILURES", "2"))
+DB_REQUEST_TRANSACTIONS = os.getenv("DB_REQUEST_TRANSACTIONS", "true") == "true"
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "5"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1024"))
+DB_MAX_INACTIVE_CONNECTION_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_CONNECTION_LIFETIME", "300"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))
+
+pool: Optional[asyncpg.Pool] = None
+replicas: List["Replica"] = []
+
+current_session: ContextVar[Optional["ReadSession"]] = ContextVar("current_session", default=None)
+current_unit: ContextVar[Optional["UnitOfWork"]] = ContextVar("current_unit", default=None)
+
+prepare_stats = {"hits": 0, "misses": 0, "evictions": 0}
+live_connections: "weakref.WeakSet[PreparedConnection]" = weakref.WeakSet()
+
+
+class PreparedConnection(asyncpg.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        live_connections.add(self)
+
+    # Every query path with arguments (fetch*, execute, executemany, cursor) prepares
+    # through here, so the counters follow asyncpg's own statement cache.
+    async def _get_statement(self, query, timeout, **kwargs):
+        state = self._cache_state(query, kwargs)
+        statement = await super()._get_statement(query, timeout, **kwargs)
+        if state is not None:
+            self._count_statement(*state)
+        return statement
+
+    # The cache and its key are asyncpg internals (pinned in requirements.txt). If a
+    # release moves them, the counters stop and queries carry on unaffected.
+    def _cache_state(self, query, options: dict):
+        if not options.get("use_cache", True):
+            return None
+        try:
+            record_class = options.get("record_class") or self._protocol.get_record_class()
+            key = (query, record_class, options.get("ignore_custom_codec", False))
+            cache = self._stmt_cache
+            return key, cache.has(key), len(cache) >= cache.get_max_size()
+        except (AttributeError, TypeError):
+            return None
+
+    def _count_statement(self, key, cached: bool, full: bool):
+        if cached:
+            prepare_stats["hits"] += 1
+            return
+        prepare_stats["misses"] += 1
+        try:
+            # A full cache that took the new statement dropped its least recently used one.
+            if full and self._stmt_cache.has(key):
+                prepare_stats["evictions"] += 1
+        except (AttributeError, TypeError):
+            pass
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        parts = urlsplit(url)
+        host = parts.hostname or parse_qs(parts.query).get("host", ["localhost"])[0]
+        self.name = f"{host}:{parts.port or 5432}{parts.path}"
+        self.pool: Optional[asyncpg.Pool] = None
+        self.healthy = False
+        self.failures = 0
+        self.in_use = 0
+        self.reads = 0
+        self.ejections = 0
+
+    def mark_failed(self):
+        self.failures += 1
+        if self.healthy and self.failures >= DB_REPLICA_MAX_FAILURES:
+            self.healthy = False
+            self.ejections += 1
+
+    def mark_healthy(self):
+        self.failures = 0
+        self.healthy = True
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "in_use": self.in_use,
+            "reads": self.reads,
+            "ejections": self.ejections,
+        }
+
+
+class ReadSession:
+    """A client's read-your-writes state, carried between requests in a cookie."""
+
+    __slots__ = ("until", "wrote")
+
+    def __init__(self, until: float = 0.0):
+        # Wall clock, so every worker and instance reads the client's cookie the same way.
+        self.until = until
+        self.wrote = False
+
+    def pinned(self) -> bool:
+        return self.until > time.time()
+
+    def extend(self, window: float = DB_READ_YOUR_WRITES_WINDOW) -> float:
+        self.until = max(self.until, time.time() + window)
+        return self.until
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    echo=os.getenv("DEBUG") == "true"
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+routing_stats = {"primary_reads": 0, "replica_reads": 0, "pinned_reads": 0, "fallbacks": 0}
+transaction_stats = {"acquisitions": 0, "units": 0, "commits": 0, "rollbacks": 0}
+_round_robin = itertools.count()
+_health_task: Optional[asyncio.Task] = None
 
-Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+def redact_dsn(url: str) -> str:
+    parts = urlsplit(url)
+    if not parts.password:
+        return url
+    userinfo, _, host = parts.netloc.rpartition("@")
+    user = userinfo.partition(":")[0]
+    return urlunsplit(parts._replace(netloc=f"{user}:***@{host}"))
+
+
+def set_pool_size(max_size: int):
+    global DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+    DB_POOL_MAX_SIZE = max(1, max_size)
+    DB_POOL_MIN_SIZE = min(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE)
+
+
+async def create_pool(url: str) -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        url,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+        command_timeout=DB_COMMAND_TIMEOUT,
+        connection_class=PreparedConnection,
+    )
+
+
+async def check_replica(replica: Replica):
     try:
-        yield db
+        if replica.pool is None:
+            replica.pool = await asyncio.wait_for(create_pool(replica.url), DB_REPLICA_HEALTH_TIMEOUT)
+        await replica.pool.fetchval("SELECT 1", timeout=DB_REPLICA_HEALTH_TIMEOUT)
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError):
+        replica.mark_failed()
+        if not replica.healthy and replica.pool is not None:
+            replica.pool.terminate()
+            replica.pool = None
+        return
+    replica.mark_healthy()
+
+
+async def monitor_replicas():
+    while True:
+        await asyncio.sleep(DB_REPLICA_HEALTH_INTERVAL)
+        await asyncio.gather(*(check_replica(replica) for replica in replicas))
+
+
+async def connect_db() -> asyncpg.Pool:
+    global pool, _health_task
+    if pool is None:
+        pool = await create_pool(DATABASE_URL)
+        print(f"🗄️  Database connected to: {redact_dsn(DATABASE_URL)}")
+
+    if DB_REPLICA_URLS and not replicas:
+        replicas.extend(Replica(url) for url in DB_REPLICA_URLS)
+        await asyncio.gather(*(check_replica(replica) for replica in replicas))
+        healthy = sum(replica.healthy for replica in replicas)
+        print(f"🗄️  Read replicas: {healthy}/{len(replicas)} healthy ({DB_REPLICA_BALANCE})")
+        _health_task = asyncio.ensure_future(monitor_replicas())
+    return pool
+
+
+async def close_db():
+    global pool, _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        try:
+            await _health_task
+        except asyncio.CancelledError:
+            pass
+        _health_task = None
+
+    for replica in replicas:
+        if replica.pool is not None:
+            await replica.pool.close()
+    replicas.clear()
+
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+
+def choose_replica() -> Optional[Replica]:
+    healthy = [replica for replica in replicas if replica.healthy]
+    if not healthy:
+        return None
+    offset = next(_round_robin)
+    if DB_REPLICA_BALANCE == "round_robin":
+        return healthy[offset % len(healthy)]
+    rotated = healthy[offset % len(healthy):] + healthy[:offset % len(healthy)]
+    return min(rotated, key=lambda replica: replica.in_use)
+
+
+@asynccontextmanager
+async def acquire(target: asyncpg.Pool):
+    start = time.perf_counter()
+    async with target.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
+        waited = time.perf_counter() - start
+        db_pool_wait.observe((), waited)
+        record_phase("pool", waited)
+        transaction_stats["acquisitions"] += 1
+        yield conn
+
+
+@asynccontextmanager
+async def get_db(readonly: bool = False, fresh: bool = False):
+    unit = current_unit.get()
+    # Fresh reads fill caches shared by concurrent requests, so they never borrow
+    # a request's connection.
+    if unit is not None and not fresh:
+        async with unit.connection() as conn:
+            yield conn
+        return
+
+    async with checkout(readonly, fresh) as conn:
+        yield conn
+
+
+@asynccontextmanager
+async def checkout(readonly: bool = False, fresh: bool = False):
+    if pool is None:
+        raise RuntimeError("Database pool is not initialized")
+
+    session = current_session.get()
+    if not readonly:
+        if session is not None:
+            session.wrote = True
+        async with acquire(pool) as conn:
+            yield conn
+        return
+
+    replica = None
+    if replicas and not fresh:
+        if session is not None and session.pinned():
+            routing_stats["pinned_reads"] += 1
+        else:
+            replica = choose_replica()
+
+    if replica is None:
+        routing_stats["primary_reads"] += 1
+        async with acquire(pool) as conn:
+            yield conn
+        return
+
+    replica_pool = replica.pool
+    replica.in_use += 1
+    start = time.perf_counter()
+    try:
+        conn = await replica_pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+        waited = time.perf_counter() - start
+        db_pool_wait.observe((), waited)
+        record_phase("pool", waited)
+        transaction_stats["acquisitions"] += 1
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError) as e:
+        replica.in_use -= 1
+        if not isinstance(e, asyncio.TimeoutError):
+            replica.mark_failed()
+        conn = None
+
+    if conn is None:
+        routing_stats["fallbacks"] += 1
+        async with acquire(pool) as conn:
+            yield conn
+        return
+
+    replica.reads += 1
+    routing_stats["replica_reads"] += 1
+    try:
+        yield conn
+    except (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError):
+        replica.mark_failed()
+        raise
+    finally:
+        replica.in_use -= 1
+        try:
+            await replica_pool.release(conn)
+        except asyncpg.InterfaceError:
+            # The health check terminated this pool after ejecting the replica.
+            pass
+
+
+class UnitOfWork:
+    def __init__(self, readonly: bool = False):
+        self.readonly = readonly
+        self.conn: Optional[asyncpg.Connection] = None
+        self._transaction = None
+        self._stack = AsyncExitStack()
+        self._lock = asyncio.Lock()
+        self._on_commit: List[Callable] = []
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._lock:
+            if self.conn is None:
+                conn = await self._stack.enter_async_context(checkout(self.readonly))
+                transaction = conn.transaction(
+                    isolation="repeatable_read" if self.readonly else None, readonly=self.readonly
+                )
+                await transaction.start()
+                self.conn, self._transaction = conn, transaction
+            yield self.conn
+
+    def on_commit(self, callback: Callable):
+        self._on_commit.append(callback)
+
+    @timed_phase("commit")
+    async def commit(self):
+        try:
+            if self._transaction is not None:
+                await self._transaction.commit()
+                transaction_stats["commits"] += 1
+        finally:
+            await self._stack.aclose()
+        for callback in self._on_commit:
+            result = callback()
+            if inspect.isawaitable(result):
+                await result
+
+    @timed_phase("commit")
+    async def rollback(self, error: BaseException):
+        try:
+            if self._transaction is not None and not self.conn.is_closed():
+                await self._transaction.rollback()
+                transaction_stats["rollbacks"] += 1
+        finally:
+            # Hand the error to checkout() so a failing replica is still marked.
+            await self._stack.__aexit__(type(error), error, error.__traceback__)
+
+
+class NotifyChannel:
+    """Broadcasts keys to every worker with LISTEN/NOTIFY on a dedicated connection."""
+
+    def __init__(self, channel: str, keepalive: float = 30.0):
+        self.channel = channel
+        self.keepalive = keepalive
+
+    async def publish(self, key):
+        if pool is not None:
+            await pool.execute("SELECT pg_notify($1, $2)", self.channel, str(key))
+
+    async def listen(self, on_message: Callable, on_ready: Callable):
+        # Outside the pool: a LISTEN connection is held for the life of the worker.
+        conn = await asyncpg.connect(DATABASE_URL)
+        closed = asyncio.Event()
+        conn.add_termination_listener(lambda _: closed.set())
+        pending = set()
+
+        def notified(_conn, _pid, _channel, payload):
+            task = asyncio.ensure_future(on_message(payload))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        try:
+            await conn.add_listener(self.channel, notified)
+            await on_ready()
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    await conn.execute("SELECT 1")
+        finally:
+            await conn.close()
+
+
+async def after_commit(callback: Callable):
+    unit = current_unit.get()
+    if unit is not None:
+        unit.on_commit(callback)
+        return
+    result = callback()
+    if inspect.isawaitable(result):
+        await result
+
+
+@asynccontextmanager
+async def unit_of_work(readonly: bool = False):
+    if not DB_REQUEST_TRANSACTIONS:
+        yield None
+        return
+
+    unit = UnitOfWork(readonly)
+    token = current_unit.set(unit)
+    transaction_stats["units"] += 1
+    try:
+        yield unit
+    except BaseException as e:
+        await unit.rollback(e)
+        raise
+    else:
+        await unit.commit()
     finally:
-        db.close()
+        current_unit.reset(token)
+
+
+async def read_transaction():
+    async with unit_of_work(readonly=True) as unit:
+        yield unit
+
+
+async def write_transaction():
+    async with unit_of_work() as unit:
+        yield unit
+
+
+def statement_stats() -> dict:
+    connections = [conn for conn in live_connections if not conn.is_closed()]
+    return {
+        **prepare_stats,
+        "connections": len(connections),
+        "cached": sum(len(getattr(conn, "_stmt_cache", ())) for conn in connections),
+    }
+
+
+def replica_stats() -> dict:
+    return {**routing_stats, "replicas": [replica.stats() for replica in replicas]}
 
-print(f"🗄️  Database connected to: {os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}")
 
-__all__ = ["Base"]
+__all__ = [
+    "connect_db",
+    "close_db",
+    "get_db",
+    "set_pool_size",
+    "prepare_stats",
+    "statement_stats",
+    "current_session",
+    "replica_stats",
+    "after_commit",
+    "read_transaction",
+    "write_transaction",
+    "transaction_stats",
+]
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.routing import compile_path
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true") == "true"
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false") == "true"
+RATE_LIMIT_CLIENT_HEADER = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+RATE_LIMIT_TRUSTED_PROXIES = [
+    address.strip() for address in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if address.strip()
+]
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "50"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "100"))
+API_KEY_RATE_LIMIT_RATE = float(os.getenv("API_KEY_RATE_LIMIT_RATE", "500"))
+API_KEY_RATE_LIMIT_BURST = float(os.getenv("API_KEY_RATE_LIMIT_BURST", "1000"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL")
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+
+TOKEN_BUCKET_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class LocalRateLimitBackend:
+    def __init__(self, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._buckets: Dict[str, list] = {}
+
+    async def take(self, key: str, rate: float, burst: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                self._sweep(now, rate, burst)
+            bucket = self._buckets[key] = [burst, now]
+
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True, 0.0
+        bucket[0] = tokens
+        return False, (1 - tokens) / rate
+
+    def _sweep(self, now: float, rate: float, burst: float):
+        idle = burst / rate
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= idle]:
+            del self._buckets[key]
+        while len(self._buckets) >= self.max_clients:
+            self._buckets.pop(next(iter(self._buckets)))
+
+
+class RedisRateLimitBackend:
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: float) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(keys=[f"{self.prefix}{key}"], args=[rate, burst, time.time()])
+        if allowed:
+            return True, 0.0
+        return False, (1 - float(tokens)) / rate
+
+
+class ConcurrencyGate:
+    def __init__(self, limit: int, queue: int, timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.limit = max(1, limit)
+        self.queue = max(0, queue)
+        self.timeout = timeout
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+    async def acquire(self) -> bool:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return True
+
+        if self.waiting >= self.queue:
+            self.rejected += 1
+            return False
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+    def resize(self, limit: int):
+        # Only safe before requests arrive: waiters on the old semaphore would be stranded.
+        self.limit = max(1, limit)
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queue": self.queue,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+def build_rate_limit_backend(url: Optional[str] = RATE_LIMIT_URL):
+    return RedisRateLimitBackend(url) if url else LocalRateLimitBackend()
+
+
+async def reject(send, status_code: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControl:
+    def __init__(
+        self,
+        api_key: Optional[str],
+        backend=None,
+        gates: Optional[dict] = None,
+        rate_limit: bool = RATE_LIMIT_ENABLED,
+        client_header: str = RATE_LIMIT_CLIENT_HEADER,
+        trusted_proxies: Iterable[str] = RATE_LIMIT_TRUSTED_PROXIES,
+    ):
+        self.api_key = api_key.encode("utf-8") if api_key else None
+        self.backend = backend or LocalRateLimitBackend()
+        self.rate_limit = rate_limit
+        self.client_header = client_header.lower().encode("latin-1") if client_header else None
+        self.trusted_proxies = frozenset(trusted_proxies)
+        self.gates = [
+            (method, path, compile_path(path)[0], gate)
+            for (method, path), gate in (gates or {}).items()
+        ]
+        self.rate_limited = 0
+
+    def identify(self, scope) -> Tuple[str, bool]:
+        if self.api_key is not None:
+            for name, value in scope["headers"]:
+                if name == b"x-api-key":
+                    if value == self.api_key:
+                        return "key", True
+                    break
+            query_string = scope.get("query_string", b"")
+            if b"x_api_key=" in query_string:
+                values = parse_qs(query_string.decode("latin-1")).get("x_api_key")
+                if values and values[0].encode("utf-8") == self.api_key:
+                    return "key", True
+
+        return f"ip:{self.client_address(scope)}", False
+
+    def client_address(self, scope) -> str:
+        client = scope.get("client")
+        address = client[0] if client else "unknown"
+        # Only a proxy we run may name the client; anyone else could pick a fresh bucket per request.
+        if self.client_header is None or address not in self.trusted_proxies:
+            return address
+        for name, value in scope["headers"]:
+            if name == self.client_header:
+                for hop in reversed(value.decode("latin-1").split(",")):
+                    hop = hop.strip()
+                    if hop and hop not in self.trusted_proxies:
+                        return hop
+                break
+        return address
+
+    async def admit(self, scope) -> Tuple[bool, float]:
+        if not self.rate_limit:
+            return True, 0.0
+        identity, trusted = self.identify(scope)
+        if trusted:
+            allowed, retry_after = await self.backend.take(identity, API_KEY_RATE_LIMIT_RATE, API_KEY_RATE_LIMIT_BURST)
+        else:
+            allowed, retry_after = await self.backend.take(identity, RATE_LIMIT_RATE, RATE_LIMIT_BURST)
+        if not allowed:
+            self.rate_limited += 1
+        return allowed, retry_after
+
+    def gate_for(self, scope) -> Optional[ConcurrencyGate]:
+        for method, _, pattern, gate in self.gates:
+            if scope["method"] == method and pattern.match(scope["path"]):
+                return gate
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "rate_limited": self.rate_limited,
+            "routes": {f"{method} {path}": gate.stats() for method, path, _, gate in self.gates},
+        }
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, control: AdmissionControl):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        allowed, retry_after = await self.control.admit(scope)
+        if not allowed:
+            await reject(send, 429, "Too many requests", retry_after)
+            return
+
+        gate = self.control.gate_for(scope)
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await gate.acquire():
+            await reject(send, 503, "Server is busy, try again later", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
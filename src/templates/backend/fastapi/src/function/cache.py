@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+import orjson
+
+MISSING = object()
+
+CACHE_RECONNECT_DELAY = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key):
+        self._entries.pop(key, None)
+
+    async def clear(self):
+        self._entries.clear()
+
+
+class RedisCache:
+    def __init__(self, url: str, ttl: float, prefix: str, decode: Callable[[bytes], Any] = orjson.loads):
+        import redis.asyncio as redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self.channel = f"{prefix}invalidate"
+        self.decode = decode
+        self._client = redis.from_url(url)
+
+    async def get(self, key) -> Any:
+        raw = await self._client.get(f"{self.prefix}{key}")
+        if raw is None:
+            return MISSING
+        return self.decode(raw)
+
+    async def set(self, key, value):
+        await self._client.set(f"{self.prefix}{key}", orjson.dumps(value), px=int(self.ttl * 1000))
+
+    async def delete(self, key):
+        await self._client.delete(f"{self.prefix}{key}")
+
+    async def clear(self):
+        async for key in self._client.scan_iter(match=f"{self.prefix}*"):
+            await self._client.delete(key)
+
+    async def publish(self, key):
+        await self._client.publish(self.channel, str(key))
+
+    async def listen(self, on_message: Callable[[str], Any], on_ready: Callable[[], Any]):
+        pubsub = self._client.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            await on_ready()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    await on_message(message["data"].decode("utf-8"))
+        finally:
+            await pubsub.aclose()
+
+
+class ReadThroughCache:
+    def __init__(self, local: LRUCache, shared=None, bus=None, parse_key: Callable[[str], Any] = str):
+        self.local = local
+        self.shared = shared
+        # Invalidations are broadcast on the bus so other workers drop their local copy.
+        # Without a live subscription the local tier cannot be trusted and is bypassed.
+        self.bus = bus
+        self.parse_key = parse_key
+        self.listening = bus is None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.broadcasts = 0
+        self._inflight: dict = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.bus is not None and self._listener is None:
+            self.listening = False
+            self._listener = asyncio.ensure_future(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self.listening = self.bus is None
+
+    async def _listen(self):
+        while True:
+            try:
+                await self.bus.listen(self._on_invalidation, self._on_subscribed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Cache invalidation subscription lost: %s", e)
+            self.listening = False
+            await asyncio.sleep(CACHE_RECONNECT_DELAY)
+
+    async def _on_subscribed(self):
+        # Invalidations sent while unsubscribed were missed, so start from empty.
+        await self.local.clear()
+        self.listening = True
+
+    async def _on_invalidation(self, key: str):
+        self.broadcasts += 1
+        await self._evict(self.parse_key(key))
+
+    async def _evict(self, key):
+        self._inflight.pop(key, None)
+        await self.local.delete(key)
+
+    async def get_or_load(self, key, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if self.listening:
+            value = await self.local.get(key)
+            if value is not MISSING:
+                self.hits += 1
+                return value
+
+        if self.shared is not None:
+            value = await self.shared.get(key)
+            if value is not MISSING:
+                self.hits += 1
+                if self.listening:
+                    await self.local.set(key, value)
+                return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    async def peek(self, key) -> Any:
+        value = await self.local.get(key) if self.listening else MISSING
+        if value is MISSING and self.shared is not None:
+            value = await self.shared.get(key)
+        return value
+
+    async def _load(self, key, loader: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await loader()
+            if value is not None and self._inflight.get(key) is task:
+                if self.listening:
+                    await self.local.set(key, value)
+                if self.shared is not None:
+                    await self.shared.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    async def invalidate(self, key):
+        await self._evict(key)
+        if self.shared is not None:
+            await self.shared.delete(key)
+        if self.bus is not None:
+            await self.bus.publish(key)
+
+    async def clear(self):
+        self._inflight.clear()
+        await self.local.clear()
+        if self.shared is not None:
+            await self.shared.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "broadcasts": self.broadcasts,
+            "listening": self.listening,
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "size": len(self.local),
+            "max_size": self.local.max_size,
+        }
+
+
+def build_cache(
+    max_size: int,
+    ttl: float,
+    shared_url: Optional[str] = None,
+    prefix: str = "",
+    decode: Callable[[bytes], Any] = orjson.loads,
+    parse_key: Callable[[str], Any] = str,
+) -> ReadThroughCache:
+    shared = RedisCache(shared_url, ttl, prefix, decode) if shared_url else None
+    return ReadThroughCache(LRUCache(max_size, ttl), shared, shared, parse_key)
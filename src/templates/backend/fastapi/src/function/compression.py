@@ -0,0 +1,250 @@
+import asyncio
+import os
+import zlib
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Optional
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true") == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", str(64 * 1024)))
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"text/")
+
+compression_stats = {"compressed": 0, "skipped": 0, "offloaded": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+class GzipCodec:
+    name = "gzip"
+
+    def __init__(self, level: int = GZIP_LEVEL):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self):
+        return GzipStream(zlib.compressobj(self.level, zlib.DEFLATED, 31))
+
+
+class GzipStream:
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCodec:
+    name = "br"
+
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        import brotli
+
+        self.quality = quality
+        self._brotli = brotli
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.compress(data, quality=self.quality)
+
+    def stream(self):
+        return BrotliStream(self._brotli.Compressor(quality=self.quality))
+
+
+class BrotliStream:
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCodec:
+    name = "zstd"
+
+    def __init__(self, level: int = ZSTD_LEVEL):
+        import zstandard
+
+        self.level = level
+        self._zstandard = zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def stream(self):
+        return ZstdStream(self._zstandard.ZstdCompressor(level=self.level).compressobj(), self._zstandard)
+
+
+class ZstdStream:
+    def __init__(self, compressor, zstandard):
+        self._compressor = compressor
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(self._flush_block)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+CODECS = {
+    "zstd": (ZstdCodec, "zstandard"),
+    "br": (BrotliCodec, "brotli"),
+    "gzip": (GzipCodec, None),
+}
+
+
+def build_codecs(encodings: str = COMPRESSION_ENCODINGS) -> dict:
+    codecs = {}
+    for name in (encoding.strip() for encoding in encodings.split(",")):
+        if name not in CODECS:
+            continue
+        codec, module = CODECS[name]
+        if module is None or find_spec(module) is not None:
+            codecs[name] = codec()
+    return codecs
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: bytes, available: tuple) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.decode("latin-1").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        accepted[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for name in available:
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compressible(headers: list) -> bool:
+    content_type = b""
+    for name, value in headers:
+        if name == b"content-encoding":
+            return False
+        if name == b"content-type":
+            content_type = value
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+async def run_codec(fn, data: bytes) -> bytes:
+    if len(data) < COMPRESSION_OFFLOAD_SIZE:
+        return fn(data)
+    compression_stats["offloaded"] += 1
+    return await asyncio.get_running_loop().run_in_executor(None, fn, data)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, codecs: Optional[dict] = None, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.codecs = build_codecs() if codecs is None else codecs
+        self.available = tuple(self.codecs)
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or not self.available:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = negotiate(value, self.available)
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, CompressedResponse(send, self.codecs[encoding], self.minimum_size))
+
+
+class CompressedResponse:
+    def __init__(self, send, codec, minimum_size: int):
+        self.send = send
+        self.codec = codec
+        self.minimum_size = minimum_size
+        self.start = None
+        self.stream = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            if message["status"] < 200 or message["status"] in (204, 304) or not compressible(message["headers"]):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            compressed = await run_codec(self.stream.compress, body) if body else b""
+            if not more_body:
+                compressed += self.stream.finish()
+            self.count(body, compressed)
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        if not more_body:
+            if len(body) < self.minimum_size:
+                compression_stats["skipped"] += 1
+                await self.send_start(False)
+                await self.send(message)
+                return
+            compressed = await run_codec(self.codec.compress, body)
+            compression_stats["compressed"] += 1
+            self.count(body, compressed)
+            await self.send_start(True, len(compressed))
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        self.stream = self.codec.stream()
+        compression_stats["compressed"] += 1
+        compressed = await run_codec(self.stream.compress, body) if body else b""
+        self.count(body, compressed)
+        await self.send_start(True)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": True})
+
+    def count(self, body: bytes, compressed: bytes):
+        compression_stats["bytes_in"] += len(body)
+        compression_stats["bytes_out"] += len(compressed)
+
+    async def send_start(self, encoded: bool, content_length: Optional[int] = None):
+        start, self.start = self.start, None
+        headers = [(name, value) for name, value in start["headers"] if name != b"vary" or value.lower() != b"accept-encoding"]
+        headers.append((b"vary", b"Accept-Encoding"))
+        if encoded:
+            headers = [(name, value) for name, value in headers if name != b"content-length"]
+            headers.append((b"content-encoding", self.codec.name.encode("ascii")))
+            if content_length is not None:
+                headers.append((b"content-length", str(content_length).encode("ascii")))
+        await self.send({**start, "headers": headers})
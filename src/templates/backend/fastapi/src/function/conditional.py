@@ -0,0 +1,92 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+from fastapi import Request, Response, status
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(as_utc(value).replace(microsecond=0), usegmt=True)
+
+
+def parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def is_conditional(request: Request) -> bool:
+    headers = request.headers
+    return "if-none-match" in headers or "if-modified-since" in headers
+
+
+class Validators:
+    def __init__(self, etag: str, last_modified: Optional[datetime], cache_control: str, use_date: bool = True):
+        self.etag = etag
+        self.last_modified = http_date(last_modified) if last_modified else None
+        self.cache_control = cache_control
+        self.use_date = use_date
+
+    @property
+    def headers(self) -> dict:
+        headers = {"ETag": self.etag}
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        if self.cache_control:
+            headers["Cache-Control"] = self.cache_control
+        return headers
+
+    def matches(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            opaque = self.etag.removeprefix("W/")
+            return any(
+                tag == "*" or tag.removeprefix("W/") == opaque
+                for tag in (part.strip() for part in if_none_match.split(","))
+            )
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or not self.use_date or not self.last_modified:
+            return False
+        since = parse_http_date(if_modified_since)
+        return since is not None and parse_http_date(self.last_modified) <= since
+
+    def not_modified(self) -> Response:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=self.headers)
+
+    def apply(self, result, response: Response):
+        target = result if isinstance(result, Response) else response
+        target.headers.update(self.headers)
+        return result
+
+
+def user_validators(user_id: int, updated_at: datetime, cache_control: str) -> Validators:
+    version = (as_utc(updated_at) - EPOCH) // timedelta(microseconds=1)
+    return Validators(f'W/"{user_id}-{version:x}"', updated_at, cache_control)
+
+
+def page_validators(versions: Iterable[tuple], has_more: bool, cache_control: str) -> Validators:
+    digest = hashlib.blake2b(digest_size=12)
+    count = 0
+    last_modified = None
+    for user_id, updated_at in versions:
+        digest.update(f"{user_id}:{updated_at.isoformat()};".encode("ascii"))
+        count += 1
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    digest.update(b"+" if has_more else b".")
+    # Rows that leave the page (soft or hard delete) do not advance the page's newest
+    # updated_at, so only the ETag is trusted for list revalidation.
+    return Validators(f'W/"{count}-{digest.hexdigest()}"', last_modified, cache_control, use_date=False)
@@ -0,0 +1,50 @@
+from http.cookies import SimpleCookie
+from src.db import DB_READ_YOUR_WRITES_COOKIE, DB_READ_YOUR_WRITES_WINDOW, ReadSession, current_session
+
+
+def read_session(scope, cookie_name: str) -> ReadSession:
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            morsel = SimpleCookie(value.decode("latin-1")).get(cookie_name)
+            if morsel is not None:
+                try:
+                    return ReadSession(float(morsel.value))
+                except ValueError:
+                    pass
+            break
+    return ReadSession()
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client's reads to the primary for a window after it writes.
+
+    The window's end travels in a cookie, so it holds across workers and instances and
+    does not depend on the client's address.
+    """
+
+    def __init__(self, app, cookie_name: str = DB_READ_YOUR_WRITES_COOKIE, window: float = DB_READ_YOUR_WRITES_WINDOW):
+        self.app = app
+        self.cookie_name = cookie_name
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        session = read_session(scope, self.cookie_name)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and session.wrote:
+                until = session.extend(self.window)
+                cookie = (
+                    f"{self.cookie_name}={until:.3f}; Max-Age={int(self.window) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        token = current_session.set(session)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_session.reset(token)
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional
+
+from src.function.metrics import bcrypt_duration
+from src.function.profiling import record_phase
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread")
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
+HASH_BULK_CHUNK = int(os.getenv("HASH_BULK_CHUNK", "16"))
+HASH_BULK_WORKERS = int(os.getenv("HASH_BULK_WORKERS", "0"))
+
+
+class HasherBusyError(RuntimeError):
+    pass
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    import bcrypt
+
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _hash_passwords(passwords: list, rounds: int) -> list:
+    return [_hash_password(password, rounds) for password in passwords]
+
+
+def _check_password(plain_password: str, hashed_password: str) -> bool:
+    import bcrypt
+
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+class PasswordHasher:
+    def __init__(self, executor_type: str, workers: int, queue_limit: int, rounds: int, bulk_workers: int = 0):
+        if executor_type not in ("thread", "process"):
+            raise ValueError(f"Unsupported hash executor: {executor_type}")
+        self.executor_type = executor_type
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.rounds = rounds
+        self.bulk_limit = max(0, bulk_workers)
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._bulk_slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_limit
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def bulk_workers(self) -> int:
+        # Bulk imports never hold every worker, so signups always find a free one.
+        if self.workers == 1:
+            return 1
+        return min(self.bulk_limit or self.workers // 2, self.workers - 1)
+
+    def start(self):
+        if self._executor is None:
+            if self.executor_type == "process":
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hasher")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._bulk_slots = None
+
+    async def _submit(self, operation: str, fn, *args):
+        if self._pending >= self.capacity:
+            raise HasherBusyError("Password hashing is saturated, try again later")
+
+        self.start()
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+            elapsed = time.perf_counter() - start
+            bcrypt_duration.observe((operation,), elapsed)
+            record_phase("hash", elapsed)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", _hash_password, password, self.rounds)
+
+    async def hash_many(self, passwords: list, chunk_size: int = HASH_BULK_CHUNK) -> list:
+        self.start()
+        loop = asyncio.get_running_loop()
+        # Shared by every import in the process; chunks wait for a slot instead of
+        # failing, and count as pending work so signups see the load.
+        if self._bulk_slots is None:
+            self._bulk_slots = asyncio.Semaphore(self.bulk_workers)
+        slots = self._bulk_slots
+
+        async def run(chunk: list) -> list:
+            async with slots:
+                self._pending += 1
+                start = time.perf_counter()
+                try:
+                    return await loop.run_in_executor(self._executor, _hash_passwords, chunk, self.rounds)
+                finally:
+                    self._pending -= 1
+                    elapsed = time.perf_counter() - start
+                    bcrypt_duration.observe(("hash_many",), elapsed)
+                    record_phase("hash", elapsed)
+
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return [hashed for chunk in results for hashed in chunk]
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", _check_password, plain_password, hashed_password)
+
+
+password_hasher = PasswordHasher(HASH_EXECUTOR, HASH_WORKERS, HASH_QUEUE_LIMIT, BCRYPT_ROUNDS, HASH_BULK_WORKERS)
@@ -1,11 +1,19 @@
+import base64
+import csv
+import json
 import re
-from typing import Any
-from src.types.user_type import CreateUserDto, UpdateUserDto
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterable, Optional, Tuple, Type, get_args
+from pydantic import BaseModel, EmailStr, TypeAdapter, ValidationError
+from src.function.profiling import timed_phase
+from src.types.user_type import CreateUserDto, UpdateUserDto, USER_FIELDS
+
+EMAIL_PATTERN = re.compile(r"^[^\s@]+@[^\s@]+\.[^\s@]+$")
+EMAIL_ADAPTER = TypeAdapter(EmailStr)
 
 
 def validate_email(email: str) -> bool:
-    email_regex = r"^[^\s@]+@[^\s@]+\.[^\s@]+$"
-    return re.match(email_regex, email) is not None
+    return EMAIL_PATTERN.match(email) is not None
 
 
 def validate_string(value: Any, min_length: int = 1, max_length: int = 255) -> bool:
@@ -16,92 +24,185 @@ def validate_boolean(value: Any) -> bool:
     return isinstance(value, bool)
 
 
-def validate_create_user_dto(data: dict) -> CreateUserDto:
-    errors = []
-
-    if not validate_email(data.get("email", "")):
-        errors.append("Invalid email format")
-
-    if not validate_string(data.get("username"), 3, 100):
-        errors.append("Username must be between 3 and 100 characters")
-
-    if not validate_string(data.get("full_name"), 1, 255):
-        errors.append("Full name must be between 1 and 255 characters")
-
-    if not validate_string(data.get("password"), 6, 255):
-        errors.append("Password must be at least 6 characters")
-
-    avatar_url = data.get("avatar_url")
-    if avatar_url is not None and not validate_string(avatar_url, 1, 1000):
-        errors.append("Avatar URL must be a valid string")
-
-    bio = data.get("bio")
-    if bio is not None and not validate_string(bio, 1, 1000):
-        errors.append("Bio must be a valid string")
-
-    role = data.get("role")
-    if role is not None and not validate_string(role, 1, 50):
-        errors.append("Role must be a valid string")
-
-    if errors:
-        raise ValueError(f"Validation error: {', '.join(errors)}")
-
-    return CreateUserDto(
-        email=data["email"],
-        username=data["username"],
-        full_name=data["full_name"],
-        password=data["password"],
-        avatar_url=avatar_url,
-        bio=bio,
-        role=role or "user",
-    )
-
-
-def validate_update_user_dto(data: dict) -> UpdateUserDto:
-    errors = []
-
-    email = data.get("email")
-    if email is not None and not validate_email(email):
-        errors.append("Invalid email format")
-
-    username = data.get("username")
-    if username is not None and not validate_string(username, 3, 100):
-        errors.append("Username must be between 3 and 100 characters")
-
-    full_name = data.get("full_name")
-    if full_name is not None and not validate_string(full_name, 1, 255):
-        errors.append("Full name must be between 1 and 255 characters")
-
-    password = data.get("password")
-    if password is not None and not validate_string(password, 6, 255):
-        errors.append("Password must be at least 6 characters")
-
-    avatar_url = data.get("avatar_url")
-    if avatar_url is not None and not validate_string(avatar_url, 1, 1000) and avatar_url is not None:
-        errors.append("Avatar URL must be a valid string or None")
-
-    bio = data.get("bio")
-    if bio is not None and not validate_string(bio, 1, 1000) and bio is not None:
-        errors.append("Bio must be a valid string or None")
-
-    role = data.get("role")
-    if role is not None and not validate_string(role, 1, 50):
-        errors.append("Role must be a valid string")
-
-    is_active = data.get("is_active")
-    if is_active is not None and not validate_boolean(is_active):
-        errors.append("is_active must be a boolean")
-
-    if errors:
-        raise ValueError(f"Validation error: {', '.join(errors)}")
-
-    return UpdateUserDto(
-        email=email,
-        username=username,
-        full_name=full_name,
-        password=password,
-        avatar_url=avatar_url,
-        bio=bio,
-        role=role,
-        is_active=is_active,
-    )
+CREATE_USER_MESSAGES = {
+    "email": "Invalid email format",
+    "username": "Username must be between 3 and 100 characters",
+    "full_name": "Full name must be between 1 and 255 characters",
+    "password": "Password must be at least 6 characters",
+    "avatar_url": "Avatar URL must be a valid string",
+    "bio": "Bio must be a valid string",
+    "role": "Role must be a valid string",
+}
+
+UPDATE_USER_MESSAGES = {
+    **CREATE_USER_MESSAGES,
+    "avatar_url": "Avatar URL must be a valid string or None",
+    "bio": "Bio must be a valid string or None",
+    "is_active": "is_active must be a boolean",
+}
+
+
+def field_kind(annotation) -> type:
+    candidates = get_args(annotation) or (annotation,)
+    for kind in (EmailStr, bool):
+        if kind in candidates:
+            return kind
+    return str
+
+
+def field_length(metadata: list, attribute: str, default: int) -> int:
+    for constraint in metadata:
+        value = getattr(constraint, attribute, None)
+        if value is not None:
+            return value
+    return default
+
+
+class CompiledValidator:
+    def __init__(self, model: Type[BaseModel], messages: dict, defaults: Optional[dict] = None):
+        self.model = model
+        self.messages = messages
+        self.defaults = defaults or {}
+        self.rules = [
+            (
+                name,
+                field_kind(field.annotation),
+                field.is_required(),
+                field_length(field.metadata, "min_length", 1),
+                field_length(field.metadata, "max_length", 255),
+                messages[name],
+            )
+            for name, field in model.model_fields.items()
+        ]
+
+    @timed_phase("validation")
+    def __call__(self, data: dict):
+        values = {}
+        errors = []
+        for name, kind, required, min_length, max_length, message in self.rules:
+            value = data.get(name)
+            if value is None:
+                if required:
+                    errors.append(message)
+                continue
+
+            if kind is str:
+                valid = isinstance(value, str) and min_length <= len(value) <= max_length
+            elif kind is bool:
+                valid = value is True or value is False
+            else:
+                # The regex rejects obvious junk cheaply; EmailStr has the final say.
+                valid = isinstance(value, str) and EMAIL_PATTERN.match(value) is not None
+                if valid:
+                    try:
+                        value = EMAIL_ADAPTER.validate_python(value)
+                    except ValidationError:
+                        valid = False
+
+            if valid:
+                values[name] = value
+            else:
+                errors.append(message)
+
+        if errors:
+            raise ValueError(f"Validation error: {', '.join(errors)}")
+
+        for name, default in self.defaults.items():
+            if values.get(name) is None:
+                values[name] = default
+        # Every field was checked above, so the DTO is built without a second Pydantic pass.
+        return self.model.model_construct(**values)
+
+    @timed_phase("validation")
+    def many(self, payloads: Iterable) -> Tuple[list, list]:
+        valid = []
+        invalid = []
+        for index, data in enumerate(payloads):
+            if not isinstance(data, dict):
+                invalid.append((index, "Malformed row"))
+                continue
+            try:
+                valid.append((index, self(data)))
+            except ValueError as e:
+                invalid.append((index, str(e)))
+        return valid, invalid
+
+
+validate_create_user_dto = CompiledValidator(CreateUserDto, CREATE_USER_MESSAGES, {"role": "user"})
+validate_update_user_dto = CompiledValidator(UpdateUserDto, UPDATE_USER_MESSAGES)
+
+
+def encode_cursor(created_at: datetime, user_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{user_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, user_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(user_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    if not fields:
+        return None
+
+    selected = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in USER_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    return selected or None
+
+
+def parse_ids(ids: str, max_count: int) -> list:
+    try:
+        user_ids = [int(user_id) for user_id in ids.split(",") if user_id.strip()]
+    except ValueError:
+        raise ValueError("User IDs must be a comma separated list of integers")
+
+    if not user_ids:
+        raise ValueError("At least one user ID is required")
+    if len(user_ids) > max_count:
+        raise ValueError(f"At most {max_count} user IDs can be requested at once")
+    if any(user_id <= 0 for user_id in user_ids):
+        raise ValueError("Invalid user ID")
+    return user_ids
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8").rstrip("\r")
+
+
+async def iter_upload_rows(chunks: AsyncIterator[bytes], upload_format: str) -> AsyncIterator[tuple]:
+    header = None
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+
+        if upload_format == "csv" and header is None:
+            header = next(csv.reader([line]))
+            continue
+
+        row_number += 1
+        try:
+            if upload_format == "csv":
+                values = next(csv.reader([line]))
+                row = {key: value or None for key, value in zip(header, values)}
+            else:
+                row = json.loads(line)
+        except (ValueError, csv.Error):
+            row = None
+
+        yield row_number, row if isinstance(row, dict) else None
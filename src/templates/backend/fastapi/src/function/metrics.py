@@ -0,0 +1,169 @@
+import functools
+import inspect
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Tuple
+from src.function.profiling import PHASE_TIMINGS, record_phase
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true") == "true"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...], buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            label_text = ",".join(f'{key}="{escape_label(value)}"' for key, value in zip(self.label_names, labels))
+            prefix = f"{label_text}," if label_text else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(sample(f"{self.name}_bucket", f'{prefix}le="{bound}"', cumulative))
+            lines.append(sample(f"{self.name}_bucket", f'{prefix}le="+Inf"', count))
+            lines.append(sample(f"{self.name}_sum", label_text, total))
+            lines.append(sample(f"{self.name}_count", label_text, count))
+        return lines
+
+
+def sample(name: str, label_text: str, value) -> str:
+    if label_text:
+        return name + "{" + label_text + "} " + str(value)
+    return f"{name} {value}"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Latency of src.sql.user_sql calls",
+    ("query",),
+)
+db_query_rows = Histogram(
+    "db_query_rows",
+    "Rows returned or affected by src.sql.user_sql calls",
+    ("query",),
+    ROW_BUCKETS,
+)
+db_pool_wait = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    (),
+)
+bcrypt_duration = Histogram(
+    "bcrypt_duration_seconds",
+    "bcrypt hashing and verification latency including executor queueing",
+    ("operation",),
+)
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop heartbeat woke up",
+    (),
+)
+
+REGISTRY = (http_request_duration, db_query_duration, db_query_rows, db_pool_wait, bcrypt_duration, event_loop_lag)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def row_count(result) -> int:
+    if result is None or result is False:
+        return 0
+    if result is True:
+        return 1
+    if isinstance(result, (list, set, tuple, dict)):
+        return len(result)
+    return 1
+
+
+def instrument_query(fn):
+    if not METRICS_ENABLED and not PHASE_TIMINGS:
+        return fn
+
+    labels = (fn.__name__,)
+
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def stream(*args, **kwargs):
+            start = time.perf_counter()
+            rows = 0
+            try:
+                async for record in fn(*args, **kwargs):
+                    rows += 1
+                    yield record
+            finally:
+                elapsed = time.perf_counter() - start
+                db_query_duration.observe(labels, elapsed)
+                record_phase("sql", elapsed)
+                db_query_rows.observe(labels, rows)
+
+        return stream
+
+    @functools.wraps(fn)
+    async def call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            db_query_duration.observe(labels, elapsed)
+            record_phase("sql", elapsed)
+        db_query_rows.observe(labels, row_count(result))
+        return result
+
+    return call
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe((scope["method"], template, status_code), time.perf_counter() - start)
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+from typing import List
+import asyncpg
+import orjson
+from src.db import DATABASE_URL, get_db
+from src.sql import statements
+
+OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "false") == "true"
+OUTBOX_SINK = os.getenv("OUTBOX_SINK", "file")
+OUTBOX_FILE = os.getenv("OUTBOX_FILE", "user_events.ndjson")
+OUTBOX_QUEUE_SIZE = int(os.getenv("OUTBOX_QUEUE_SIZE", "10000"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_BUFFER_SIZE = int(os.getenv("OUTBOX_BUFFER_SIZE", "5000"))
+OUTBOX_PARTITIONS = int(os.getenv("OUTBOX_PARTITIONS", "4"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_RETRY_MAX_DELAY = float(os.getenv("OUTBOX_RETRY_MAX_DELAY", "30"))
+OUTBOX_LOCK_KEY = int(os.getenv("OUTBOX_LOCK_KEY", "72200"))
+
+logger = logging.getLogger(__name__)
+
+
+class SinkFullError(Exception):
+    pass
+
+
+class FileSink:
+    def __init__(self, path: str = OUTBOX_FILE):
+        self.path = path
+
+    async def deliver(self, events: List[dict]):
+        data = b"".join(orjson.dumps(event) + b"\n" for event in events)
+        await asyncio.get_running_loop().run_in_executor(None, self._append, data)
+
+    def _append(self, data: bytes):
+        with open(self.path, "ab") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class QueueSink:
+    def __init__(self, max_size: int = OUTBOX_QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(max_size)
+
+    async def deliver(self, events: List[dict]):
+        if self.queue.maxsize and self.queue.maxsize - self.queue.qsize() < len(events):
+            raise SinkFullError("Event queue is full")
+        for event in events:
+            self.queue.put_nowait(event)
+
+
+SINKS = {
+    "file": FileSink,
+    "queue": QueueSink,
+}
+
+
+def build_sink(name: str = OUTBOX_SINK):
+    if name not in SINKS:
+        raise ValueError(f"Unsupported outbox sink: {name}")
+    return SINKS[name]()
+
+
+def to_event(record) -> dict:
+    return {
+        "id": record["id"],
+        "user_id": record["user_id"],
+        "type": record["event_type"],
+        "payload": orjson.loads(record["payload"]),
+        "created_at": record["created_at"],
+    }
+
+
+class OutboxRelay:
+    def __init__(
+        self,
+        sink,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        buffer_size: int = OUTBOX_BUFFER_SIZE,
+        partitions: int = OUTBOX_PARTITIONS,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+    ):
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        self.buffer_size = max(1, buffer_size)
+        self.partitions = max(1, partitions)
+        self.poll_interval = poll_interval
+        self.leader = False
+        self.last_id = 0
+        self.in_flight = 0
+        self.delivered = 0
+        self.retries = 0
+        self._wake = asyncio.Event()
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def notify(self):
+        self._wake.set()
+
+    async def start(self):
+        size = max(1, self.buffer_size // self.partitions)
+        self._queues = [asyncio.Queue(size) for _ in range(self.partitions)]
+        self._tasks = [asyncio.ensure_future(self._read())]
+        self._tasks.extend(asyncio.ensure_future(self._deliver(queue)) for queue in self._queues)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.leader = False
+
+    async def _wait(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _read(self):
+        delay = 0.1
+        while True:
+            try:
+                # The advisory lock is held by the session, so the leader reads on its own
+                # connection instead of pinning one of the pool's.
+                conn = await asyncpg.connect(DATABASE_URL)
+                try:
+                    self.leader = await conn.fetchval("SELECT pg_try_advisory_lock($1)", OUTBOX_LOCK_KEY)
+                    if self.leader:
+                        delay = 0.1
+                        await self._poll(conn)
+                finally:
+                    self.leader = False
+                    # Closing the session releases the lock.
+                    await conn.close()
+                await asyncio.sleep(self.poll_interval * 5)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.warning("Outbox reader failed, retrying in %.1fs: %s", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, OUTBOX_RETRY_MAX_DELAY)
+
+    async def _poll(self, conn):
+        while True:
+            self._wake.clear()
+            records = await conn.fetch(statements.SELECT_USER_EVENTS, self.last_id, self.batch_size)
+            for record in records:
+                self.in_flight += 1
+                await self._queues[record["user_id"] % self.partitions].put(record)
+            if records:
+                self.last_id = records[-1]["id"]
+            if len(records) < self.batch_size:
+                # Sequence ids are handed out before commit, so a slow writer can commit an
+                # id below last_id; rescan from the start once everything read was deleted.
+                if self.in_flight == 0:
+                    self.last_id = 0
+                await self._wait(self.poll_interval)
+
+    async def _deliver(self, queue: asyncio.Queue):
+        while True:
+            records = [await queue.get()]
+            while len(records) < self.batch_size and not queue.empty():
+                records.append(queue.get_nowait())
+
+            events = [to_event(record) for record in records]
+            await self._retry("Outbox delivery", self.sink.deliver, events)
+            await self._retry("Outbox acknowledge", self._acknowledge, [record["id"] for record in records])
+            self.in_flight -= len(records)
+            self.delivered += len(records)
+
+    async def _acknowledge(self, ids: list):
+        async with get_db() as conn:
+            await conn.execute(statements.DELETE_USER_EVENTS, ids)
+
+    async def _retry(self, operation: str, fn, *args):
+        delay = 0.1
+        while True:
+            try:
+                return await fn(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.retries += 1
+                logger.warning("%s failed, retrying in %.1fs: %s", operation, delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, OUTBOX_RETRY_MAX_DELAY)
+
+    def stats(self) -> dict:
+        return {
+            "leader": self.leader,
+            "last_id": self.last_id,
+            "in_flight": self.in_flight,
+            "delivered": self.delivered,
+            "retries": self.retries,
+        }
+
+
+outbox = OutboxRelay(build_sink()) if OUTBOX_ENABLED else None
@@ -0,0 +1,362 @@
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Optional
+from fastapi.routing import APIRoute
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false") == "true"
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_BUFFER = int(os.getenv("SLOW_REQUEST_BUFFER", "100"))
+LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "0"))
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "50"))
+
+PHASE_TIMINGS = SLOW_REQUEST_MS > 0
+SUSPENDED_FLAGS = inspect.CO_COROUTINE | inspect.CO_ITERABLE_COROUTINE | inspect.CO_ASYNC_GENERATOR | inspect.CO_GENERATOR
+LOOP_RUNNERS = ("run_forever", "run_until_complete")
+TOP_LEVEL_PHASES = ("validation", "service", "commit", "serialization")
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    __slots__ = ("phases", "active", "route_start")
+
+    def __init__(self):
+        self.phases = {}
+        self.active = set()
+        self.route_start = None
+
+    def add(self, name: str, seconds: float):
+        total, count = self.phases.get(name, (0.0, 0))
+        self.phases[name] = (total + seconds, count + 1)
+
+    def total(self, name: str) -> float:
+        return self.phases.get(name, (0.0, 0))[0]
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+def record_phase(name: str, seconds: float):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def timed_phase(name: str):
+    def decorate(fn):
+        if not PHASE_TIMINGS:
+            return fn
+
+        # Nested calls of the same phase (validator.many() calling the validator) are timed once.
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def call(*args, **kwargs):
+                timings = current_timings.get()
+                if timings is None or name in timings.active:
+                    return await fn(*args, **kwargs)
+                timings.active.add(name)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    timings.active.discard(name)
+                    timings.add(name, time.perf_counter() - start)
+
+            return call
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            timings = current_timings.get()
+            if timings is None or name in timings.active:
+                return fn(*args, **kwargs)
+            timings.active.add(name)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings.active.discard(name)
+                timings.add(name, time.perf_counter() - start)
+
+        return run
+
+    return decorate
+
+
+def timed_endpoint(endpoint):
+    @functools.wraps(endpoint)
+    async def call(*args, **kwargs):
+        timings = current_timings.get()
+        if timings is None:
+            return await endpoint(*args, **kwargs)
+        start = time.perf_counter()
+        # Everything between the route handler starting and the endpoint running is
+        # FastAPI reading the body, resolving dependencies and validating parameters.
+        if timings.route_start is not None:
+            timings.add("validation", start - timings.route_start)
+        # Validators and ORJSON rendering run inside the endpoint but keep their own phase.
+        before = timings.total("validation") + timings.total("serialization")
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            inline = timings.total("validation") + timings.total("serialization") - before
+            timings.add("service", time.perf_counter() - start - inline)
+
+    return call
+
+
+class TimedRoute(APIRoute):
+    """Splits route handling into validation, service, commit and serialization phases."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if PHASE_TIMINGS and inspect.iscoroutinefunction(endpoint):
+            endpoint = timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not PHASE_TIMINGS:
+            return handler
+
+        async def timed_handler(request):
+            timings = current_timings.get()
+            if timings is None:
+                return await handler(request)
+            timings.route_start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                # Function scoped dependencies commit after the endpoint returns, so the
+                # remainder minus the commit is response validation and rendering.
+                accounted = sum(timings.total(name) for name in ("validation", "service", "commit"))
+                remainder = time.perf_counter() - timings.route_start - accounted
+                timings.add("serialization", max(remainder, 0.0))
+
+        return timed_handler
+
+
+slow_requests: deque = deque(maxlen=SLOW_REQUEST_BUFFER)
+
+
+class SlowRequestMiddleware:
+    def __init__(self, app, threshold_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.threshold = threshold_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timings.reset(token)
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.threshold:
+                self.report(scope, status_code, elapsed, timings)
+
+    def report(self, scope, status_code: int, elapsed: float, timings: RequestTimings):
+        route = scope.get("route")
+        phases = {name: round(total * 1000, 3) for name, (total, _) in timings.phases.items()}
+        # sql, pool and hash happen inside service (or commit), so they are not subtracted again.
+        accounted = sum(phases.get(name, 0.0) for name in TOP_LEVEL_PHASES)
+        phases["other"] = round(max(elapsed * 1000 - accounted, 0.0), 3)
+        entry = {
+            "at": time.time(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", None),
+            "status": status_code,
+            "total_ms": round(elapsed * 1000, 3),
+            "phases_ms": phases,
+            "counts": {name: count for name, (_, count) in timings.phases.items()},
+        }
+        slow_requests.append(entry)
+        logger.warning(
+            "Slow request %s %s %d in %.1f ms: %s",
+            entry["method"],
+            entry["path"],
+            status_code,
+            entry["total_ms"],
+            " ".join(f"{name}={value:.1f}ms" for name, value in phases.items()),
+        )
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self._lock = asyncio.Lock()
+        self._labels = {}
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float, all_threads: bool = False, idle: bool = False) -> str:
+        seconds = min(seconds, self.max_seconds)
+        async with self._lock:
+            stacks = Counter()
+            stop = threading.Event()
+            target = None if all_threads else threading.get_ident()
+            driver = None if idle else self._loop_driver()
+            sampler = threading.Thread(
+                target=self._sample, args=(stacks, stop, target, idle, driver), name="profiler", daemon=True
+            )
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                stop.set()
+                await asyncio.get_running_loop().run_in_executor(None, sampler.join)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def _sample(self, stacks: Counter, stop: threading.Event, target: Optional[int], idle: bool, driver):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (target is not None and ident != target):
+                    continue
+                if not idle and self._idle(frame, driver):
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                if target is None:
+                    if ident not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    frames.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(frames))] += 1
+
+    def _loop_driver(self):
+        # uvloop waits for I/O in C, so while it is idle the newest Python frame is the one
+        # that started the loop (asyncio.Runner.run under uvicorn): the first frame below
+        # this task's coroutines. asyncio's own loop is caught by its select() frame instead.
+        if isinstance(asyncio.get_running_loop(), asyncio.BaseEventLoop):
+            return None
+        frame = sys._getframe(1)
+        while frame is not None and frame.f_code.co_flags & SUSPENDED_FLAGS:
+            frame = frame.f_back
+        return frame.f_code if frame is not None else None
+
+    def _idle(self, frame, driver=None) -> bool:
+        code = frame.f_code
+        if code is driver or code.co_name in LOOP_RUNNERS or "uvloop" in code.co_filename:
+            return True
+        return code.co_name in ("select", "poll", "wait") and code.co_filename.endswith(("selectors.py", "threading.py"))
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename.replace("\\", "/")
+            short = "/".join(path.rsplit("/", 2)[-2:])
+            label = self._labels[code] = f"{code.co_name} ({short}:{code.co_firstlineno})"
+        return label
+
+
+class LoopLagMonitor:
+    def __init__(self, warn_ms: float = LOOP_LAG_WARN_MS, interval_ms: float = LOOP_LAG_INTERVAL_MS):
+        self.threshold = warn_ms / 1000
+        self.interval = interval_ms / 1000
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stall_count = 0
+        self.stalls: deque = deque(maxlen=SLOW_REQUEST_BUFFER)
+        self._beat = time.monotonic()
+        self._reported = False
+        self._pending_stack = None
+        self._loop_thread = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def start(self):
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.ensure_future(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        from src.function.metrics import event_loop_lag
+
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            self._beat = now
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            event_loop_lag.observe((), lag)
+            if lag >= self.threshold:
+                self.stall_count += 1
+                if not self._reported:
+                    logger.warning("Event loop lagged %.1f ms", lag * 1000)
+                self.stalls.append({"at": time.time(), "lag_ms": round(lag * 1000, 3), "stack": self._pending_stack})
+            self._reported = False
+            self._pending_stack = None
+
+    def _watch(self):
+        # Poll faster than the threshold so a stall is caught while it is still blocking.
+        poll = min(self.interval, self.threshold / 2)
+        while not self._stop.wait(poll):
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked < self.threshold or self._reported:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)
+            self._pending_stack = [line.rstrip() for line in stack[-12:]]
+            self._reported = True
+            logger.warning("Event loop blocked for %.1f ms in:\n%s", blocked * 1000, "".join(stack[-12:]).rstrip())
+
+    def stats(self) -> dict:
+        return {
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stalls": self.stall_count,
+        }
+
+
+profiler = SamplingProfiler()
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,23 @@
+import os
+from typing import Any
+import orjson
+from fastapi import status
+from fastapi.responses import Response
+from src.function.profiling import timed_phase
+from src.types.user_type import ApiResponse
+
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "false") == "true"
+
+
+class ORJSONResponse(Response):
+    media_type = "application/json"
+
+    @timed_phase("serialization")
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def respond(payload: ApiResponse, status_code: int = status.HTTP_200_OK):
+    if FAST_RESPONSES:
+        return ORJSONResponse(payload.__dict__, status_code=status_code)
+    return payload
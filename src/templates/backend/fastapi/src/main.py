@@ -1,39 +1,149 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi import Depends, HTTPException, status
+from contextlib import asynccontextmanager
 from datetime import datetime
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from typing import Optional
 
 load_dotenv()
 
+from src.db import (
+    DB_REPLICA_URLS,
+    NotifyChannel,
+    connect_db,
+    close_db,
+    statement_stats,
+    replica_stats,
+    transaction_stats,
+)
+from src.function.hasher import password_hasher
+from src.resources import resources
+from src.function.metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+from src.function.compression import COMPRESSION_ENABLED, CompressionMiddleware, compression_stats
+from src.function.consistency import ReadYourWritesMiddleware
+from src.function.outbox import OUTBOX_ENABLED, outbox
+from src.function.profiling import (
+    LOOP_LAG_WARN_MS,
+    PROFILING_ENABLED,
+    SLOW_REQUEST_MS,
+    SlowRequestMiddleware,
+    loop_monitor,
+    profiler,
+    slow_requests,
+)
+from src.function.admission import (
+    ADMISSION_ENABLED,
+    RATE_LIMIT_ENABLED,
+    AdmissionControl,
+    AdmissionMiddleware,
+    ConcurrencyGate,
+    build_rate_limit_backend,
+)
+from src.api.user_api import router as user_router
+from src.service.user_loader import RequestLoaderMiddleware
+from src.service.user_service import USER_CACHE_BROADCAST, USER_CACHE_URL, USER_STORE, user_service
+
 API_KEY = os.getenv("X_API_KEY", "1234")
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:4200").split(",")
+SIGNUP_CONCURRENCY = int(os.getenv("SIGNUP_CONCURRENCY", "0"))
+SIGNUP_QUEUE = int(os.getenv("SIGNUP_QUEUE", "32"))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "16"))
+SEARCH_QUEUE = int(os.getenv("SEARCH_QUEUE", "64"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "2"))
+BULK_QUEUE = int(os.getenv("BULK_QUEUE", "0"))
+
+signup_gate = ConcurrencyGate(SIGNUP_CONCURRENCY or password_hasher.workers * 2, SIGNUP_QUEUE)
+admission = AdmissionControl(
+    API_KEY,
+    build_rate_limit_backend() if RATE_LIMIT_ENABLED else None,
+    {
+        ("POST", "/users/"): signup_gate,
+        ("POST", "/users/bulk"): ConcurrencyGate(BULK_CONCURRENCY, BULK_QUEUE),
+        ("GET", "/users/search/{keyword}"): ConcurrencyGate(SEARCH_CONCURRENCY, SEARCH_QUEUE),
+    },
+)
+
+
+if USER_STORE == "memory":
+    from src.sql.memory_user_sql import store
+
+    resources.register("user_store", store.start)
+else:
+    resources.register("database", connect_db, close_db)
+    if USER_CACHE_BROADCAST and not USER_CACHE_URL:
+        user_service.cache.bus = NotifyChannel("user_cache")
+resources.register("user_cache", user_service.cache.start, user_service.cache.stop)
+resources.register("password_hasher", password_hasher.start, password_hasher.shutdown)
+
+
+def size_signup_gate():
+    # src.server sets the hash workers per process after this module is imported.
+    if not SIGNUP_CONCURRENCY:
+        signup_gate.resize(password_hasher.workers * 2)
+
+
+resources.register("signup_gate", size_signup_gate)
+if OUTBOX_ENABLED:
+    resources.register("outbox", outbox.start, outbox.stop)
+if LOOP_LAG_WARN_MS:
+    resources.register("loop_monitor", loop_monitor.start, loop_monitor.stop)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await resources.start()
+    try:
+        yield
+    finally:
+        await resources.stop()
+
 
 app = FastAPI(
     title="{{projectName}} API",
     description="A modern web application API built with FastAPI",
     version="1.0.0",
     docs_url="/w",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, control=admission)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "X-API-Key"],
+    allow_headers=["Content-Type", "Authorization", "X-API-Key", "If-None-Match", "If-Modified-Since"],
+    expose_headers=["ETag", "Last-Modified"],
 )
 
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+if DB_REPLICA_URLS:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+app.add_middleware(RequestLoaderMiddleware, batch_fn=user_service.load_users)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+if SLOW_REQUEST_MS:
+    app.add_middleware(SlowRequestMiddleware)
+
+app.include_router(user_router)
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "ok",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "resources": resources.stats(),
     }
 
 async def verify_api_key(x_api_key: Optional[str] = None):
@@ -44,10 +154,52 @@ async def verify_api_key(x_api_key: Optional[str] = None):
         )
     return x_api_key
 
+@app.get("/cache/stats")
+async def cache_stats(api_key: str = Depends(verify_api_key)):
+    return {
+        "users": user_service.cache.stats(),
+        "statements": statement_stats(),
+        "database": replica_stats(),
+        "transactions": dict(transaction_stats),
+        "admission": admission.stats(),
+        "compression": dict(compression_stats),
+        "outbox": outbox.stats() if OUTBOX_ENABLED else None,
+        "event_loop": loop_monitor.stats() if LOOP_LAG_WARN_MS else None,
+    }
+
+@app.get("/debug/profile", include_in_schema=False)
+async def profile(
+    seconds: float = 10,
+    all_threads: bool = False,
+    idle: bool = False,
+    api_key: str = Depends(verify_api_key),
+):
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    if seconds <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="seconds must be positive")
+    if profiler.running:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+    stacks = await profiler.profile(seconds, all_threads, idle)
+    return PlainTextResponse(stacks)
+
+@app.get("/debug/slow", include_in_schema=False)
+async def slow(api_key: str = Depends(verify_api_key)):
+    return {
+        "requests": list(slow_requests),
+        "loop_stalls": list(loop_monitor.stalls),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": f"Hello FastAPI {{projectName}}"}
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=4100)
+    from src.server import run
+    run(app)
@@ -0,0 +1,60 @@
+import inspect
+import time
+from typing import Callable, List, Optional
+
+
+class Resource:
+    def __init__(self, name: str, start: Callable, stop: Optional[Callable] = None):
+        self.name = name
+        self.start = start
+        self.stop = stop
+        self.started = False
+        self.startup_seconds = 0.0
+
+
+async def call(fn: Callable):
+    result = fn()
+    if inspect.isawaitable(result):
+        await result
+
+
+class ResourceContainer:
+    def __init__(self):
+        self._resources: List[Resource] = []
+
+    def register(self, name: str, start: Callable, stop: Optional[Callable] = None):
+        self._resources.append(Resource(name, start, stop))
+
+    async def start(self):
+        for resource in self._resources:
+            started_at = time.perf_counter()
+            try:
+                await call(resource.start)
+            except Exception:
+                await self.stop()
+                raise
+            resource.startup_seconds = time.perf_counter() - started_at
+            resource.started = True
+
+    async def stop(self):
+        errors = []
+        for resource in reversed(self._resources):
+            if not resource.started:
+                continue
+            resource.started = False
+            if resource.stop is not None:
+                try:
+                    await call(resource.stop)
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def stats(self) -> dict:
+        return {
+            resource.name: {"started": resource.started, "startup_ms": round(resource.startup_seconds * 1000, 2)}
+            for resource in self._resources
+        }
+
+
+resources = ResourceContainer()
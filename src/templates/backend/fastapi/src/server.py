@@ -0,0 +1,98 @@
+import os
+
+from dotenv import load_dotenv
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+load_dotenv()
+
+from src import db
+from src.function.hasher import password_hasher
+from src.function.outbox import OUTBOX_ENABLED
+from src.service.user_service import USER_CACHE_BROADCAST, USER_CACHE_URL, USER_STORE
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "4100"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "0"))
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "10000"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", "60"))
+KEEPALIVE = int(os.getenv("KEEPALIVE", "5"))
+
+
+class ProductionWorker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+class Server(BaseApplication):
+    def __init__(self, app, options: dict):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def worker_count() -> int:
+    return WEB_CONCURRENCY or os.cpu_count() or 1
+
+
+def dedicated_connections() -> int:
+    """Primary connections each worker opens outside its pool."""
+    if USER_STORE == "memory":
+        return 0
+    cache_listener = USER_CACHE_BROADCAST and not USER_CACHE_URL
+    return int(cache_listener) + int(OUTBOX_ENABLED)
+
+
+def pool_size_per_worker(workers: int, budget: int, dedicated: int = 0) -> int:
+    if budget <= 0:
+        return db.DB_POOL_MAX_SIZE
+    size = budget // workers - dedicated
+    if size < 1:
+        raise ValueError(
+            f"DB_CONNECTION_BUDGET ({budget}) leaves no pool connections for {workers} workers "
+            f"with {dedicated} dedicated connection(s) each"
+        )
+    return size
+
+
+def run(app):
+    workers = worker_count()
+    dedicated = dedicated_connections()
+    db.set_pool_size(pool_size_per_worker(workers, DB_CONNECTION_BUDGET, dedicated))
+    if "HASH_WORKERS" not in os.environ:
+        password_hasher.workers = max(1, (os.cpu_count() or 1) // workers)
+
+    print(
+        f"🚀 Starting {workers} worker(s) on {HOST}:{PORT} "
+        f"(db pool {db.DB_POOL_MIN_SIZE}-{db.DB_POOL_MAX_SIZE} + {dedicated} dedicated per worker, "
+        f"{password_hasher.workers} hash thread(s) per worker)"
+    )
+    Server(
+        app,
+        {
+            "bind": f"{HOST}:{PORT}",
+            "workers": workers,
+            "worker_class": "src.server.ProductionWorker",
+            "preload_app": True,
+            "max_requests": MAX_REQUESTS,
+            "max_requests_jitter": MAX_REQUESTS_JITTER if MAX_REQUESTS else 0,
+            "graceful_timeout": GRACEFUL_TIMEOUT,
+            "timeout": WORKER_TIMEOUT,
+            "keepalive": KEEPALIVE,
+        },
+    ).run()
+
+
+if __name__ == "__main__":
+    from src.main import app
+
+    run(app)
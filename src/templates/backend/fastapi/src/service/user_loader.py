@@ -0,0 +1,66 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class UserLoader:
+    def __init__(self, batch_fn: Callable[[List[int]], Awaitable[Dict[int, dict]]], max_batch_size: int = 500):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.loads = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    async def load(self, key: int):
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+            future = loop.create_future()
+            self._pending[key] = future
+        return await asyncio.shield(future)
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        for i in range(0, len(keys), self.max_batch_size):
+            batch = {key: pending[key] for key in keys[i:i + self.max_batch_size]}
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: Dict[int, asyncio.Future]):
+        self.batches += 1
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+
+current_loader: ContextVar[Optional[UserLoader]] = ContextVar("current_loader", default=None)
+
+
+class RequestLoaderMiddleware:
+    """Gives each request its own UserLoader, so lookups batch within a request only."""
+
+    def __init__(self, app, batch_fn: Callable[[List[int]], Awaitable[Dict[int, dict]]]):
+        self.app = app
+        self.batch_fn = batch_fn
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_loader.set(UserLoader(self.batch_fn))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_loader.reset(token)
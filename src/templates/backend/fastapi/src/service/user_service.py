@@ -1,17 +1,93 @@
-import src.sql.user_sql as UserSQL
-from src.types.user_type import User, CreateUserDto, UpdateUserDto, UserResponse
+import asyncio
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Optional
+import orjson
+from src.db import after_commit
+from src.function.cache import MISSING, ReadThroughCache, build_cache
+from src.function.hasher import password_hasher
+from src.function.helper import encode_cursor, decode_cursor, validate_create_user_dto
+from src.service.user_loader import UserLoader, current_loader
+from src.types.user_type import CreateUserDto, UpdateUserDto, DuplicateUserError, USER_FIELDS
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_URL = os.getenv("USER_CACHE_URL")
+USER_CACHE_BROADCAST = os.getenv("USER_CACHE_BROADCAST", "true") == "true"
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+
+USER_STORE = os.getenv("USER_STORE", "postgres")
+
+if USER_STORE == "memory":
+    import src.sql.memory_user_sql as UserSQL
+else:
+    import src.sql.user_sql as UserSQL
+
+
+def decode_cached_user(raw: bytes) -> dict:
+    user = orjson.loads(raw)
+    for field in ("created_at", "updated_at"):
+        if user.get(field) is not None:
+            user[field] = datetime.fromisoformat(user[field])
+    return user
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
 
 
 class UserService:
-    async def get_all_users(self):
-        users = await UserSQL.get_users()
-        return [self.map_to_response(user) for user in users]
+    def __init__(self, cache: ReadThroughCache):
+        self.cache = cache
+
+    @property
+    def loader(self) -> UserLoader:
+        # Outside a request (benches, background work) each lookup gets a loader of its own.
+        loader = current_loader.get()
+        return loader if loader is not None else UserLoader(self.load_users)
+
+    async def get_all_users(self, limit: int, cursor: Optional[str] = None, fields: Optional[tuple] = None):
+        after = decode_cursor(cursor) if cursor else None
+        users = await UserSQL.get_users(limit + 1, after, fields)
+        versions = [(user["id"], user["updated_at"]) for user in users[:limit]]
+        return (*self.map_to_page(users, limit, fields), (versions, len(users) > limit))
+
+    async def get_user_page_versions(self, limit: int, cursor: Optional[str] = None):
+        after = decode_cursor(cursor) if cursor else None
+        versions = await UserSQL.get_user_versions(limit + 1, after)
+        return [tuple(version) for version in versions[:limit]], len(versions) > limit
+
+    async def get_user_version(self, user_id: int):
+        user = await self.cache.peek(user_id)
+        if user is not MISSING:
+            return user["updated_at"]
+        return await UserSQL.get_user_version(user_id)
 
     async def get_user_by_id(self, user_id: int):
-        user = await UserSQL.get_user_by_id(user_id)
-        if not user:
-            return None
-        return self.map_to_response(user)
+        return await self.cache.get_or_load(user_id, lambda: self._load_user(user_id))
+
+    async def _load_user(self, user_id: int):
+        return await self.loader.load(user_id)
+
+    async def load_users(self, user_ids: list) -> dict:
+        users = await UserSQL.get_users_by_ids(user_ids)
+        return {user["id"]: self.map_to_response(user) for user in users}
+
+    async def get_users_by_ids(self, user_ids: list) -> dict:
+        unique_ids = list(dict.fromkeys(user_ids))
+        found = dict(zip(unique_ids, await asyncio.gather(*(self.get_user_by_id(user_id) for user_id in unique_ids))))
+        return {
+            "users": [found[user_id] for user_id in user_ids if found[user_id]],
+            "missing": [user_id for user_id in unique_ids if not found[user_id]],
+        }
 
     async def get_user_by_email(self, email: str):
         return await UserSQL.get_user_by_email(email)
@@ -20,63 +96,160 @@ class UserService:
         return await UserSQL.get_user_by_username(username)
 
     async def create_user(self, data: CreateUserDto):
-        existing_user = await UserSQL.get_user_by_email(data.email)
-        if existing_user:
+        try:
+            user = await UserSQL.create_user(data)
+        except DuplicateUserError as e:
+            if e.field == "username":
+                raise ValueError("Username already taken")
             raise ValueError("User with this email already exists")
 
-        existing_username = await UserSQL.get_user_by_username(data.username)
-        if existing_username:
-            raise ValueError("Username already taken")
-
-        user = await UserSQL.create_user(data)
         return self.map_to_response(user)
 
     async def update_user(self, user_id: int, data: UpdateUserDto):
-        existing_user = await UserSQL.get_user_by_id(user_id)
-        if not existing_user:
-            raise ValueError("User not found")
-
-        if data.email:
-            email_user = await UserSQL.get_user_by_email(data.email)
-            if email_user and email_user["id"] != user_id:
-                raise ValueError("Email already in use")
+        if all(value is None for value in data.__dict__.values()):
+            user = await self.get_user_by_id(user_id)
+            if not user:
+                raise ValueError("User not found")
+            return user
 
-        if data.username:
-            username_user = await UserSQL.get_user_by_username(data.username)
-            if username_user and username_user["id"] != user_id:
+        try:
+            user = await UserSQL.update_user(user_id, data)
+        except DuplicateUserError as e:
+            if e.field == "username":
                 raise ValueError("Username already taken")
+            raise ValueError("Email already in use")
 
-        filtered_data = {k: v for k, v in data.model_dump().items() if v is not None}
-        if not filtered_data:
-            return await self.get_user_by_id(user_id)
-
-        user = await UserSQL.update_user(user_id, UpdateUserDto(**filtered_data))
+        await after_commit(lambda: self.cache.invalidate(user_id))
         if not user:
-            return None
+            raise ValueError("User not found")
         return self.map_to_response(user)
 
-    async def delete_user(self, user_id: int) -> bool:
-        existing_user = await UserSQL.get_user_by_id(user_id)
-        if not existing_user:
-            raise ValueError("User not found")
+    async def bulk_create_users(self, rows: AsyncIterator[tuple]) -> dict:
+        report = {"total": 0, "inserted": 0, "failed": 0, "errors": []}
+        seen = (set(), set())
+        pending = []
 
-        return await UserSQL.delete_user(user_id)
+        async for row in rows:
+            report["total"] += 1
+            pending.append(row)
+            if len(pending) >= BULK_BATCH_SIZE:
+                await self._import_rows(pending, seen, report)
+                pending = []
 
-    async def soft_delete_user(self, user_id: int):
-        existing_user = await UserSQL.get_user_by_id(user_id)
-        if not existing_user:
+        if pending:
+            await self._import_rows(pending, seen, report)
+
+        report["errors"].sort(key=lambda error: error["row"])
+        report["failed"] = len(report["errors"])
+        return report
+
+    async def _import_rows(self, rows: list, seen: tuple, report: dict):
+        seen_emails, seen_usernames = seen
+        valid, invalid = validate_create_user_dto.many(row for _, row in rows)
+        for index, error in invalid:
+            report["errors"].append({"row": rows[index][0], "error": error})
+
+        batch = []
+        for index, data in valid:
+            row_number = rows[index][0]
+            if data.email in seen_emails:
+                report["errors"].append({"row": row_number, "error": "Duplicate email in upload"})
+            elif data.username in seen_usernames:
+                report["errors"].append({"row": row_number, "error": "Duplicate username in upload"})
+            else:
+                seen_emails.add(data.email)
+                seen_usernames.add(data.username)
+                batch.append((row_number, data))
+
+        if batch:
+            await self._import_batch(batch, report)
+
+    async def _import_batch(self, batch: list, report: dict):
+        hashed_passwords = await password_hasher.hash_many([data.password for _, data in batch])
+        records = [
+            (row_number, data.email, data.username, data.full_name, hashed, data.avatar_url, data.bio, data.role or "user")
+            for (row_number, data), hashed in zip(batch, hashed_passwords)
+        ]
+        inserted = await UserSQL.bulk_create_users(records)
+
+        report["inserted"] += len(inserted)
+        for row_number, data in batch:
+            if data.email not in inserted:
+                report["errors"].append({"row": row_number, "error": "User with this email or username already exists"})
+
+    async def delete_user(self, user_id: int) -> bool:
+        deleted = await UserSQL.delete_user(user_id)
+        await after_commit(lambda: self.cache.invalidate(user_id))
+        if not deleted:
             raise ValueError("User not found")
+        return deleted
 
+    async def soft_delete_user(self, user_id: int):
         user = await UserSQL.soft_delete_user(user_id)
+        await after_commit(lambda: self.cache.invalidate(user_id))
         if not user:
-            return None
+            raise ValueError("User not found")
         return self.map_to_response(user)
 
-    async def search_users(self, keyword: str):
-        users = await UserSQL.search_users(keyword)
-        return [self.map_to_response(user) for user in users]
+    async def search_users(
+        self,
+        keyword: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[tuple] = None,
+        mode: str = "contains",
+    ):
+        if mode in UserSQL.RANKED_SEARCH_MODES:
+            if cursor:
+                raise ValueError(f"Cursor pagination is not supported for {mode} search")
+            users = await UserSQL.search_users(keyword, mode, limit, None, fields)
+            return self.map_to_rows(users, fields), None
+
+        after = decode_cursor(cursor) if cursor else None
+        users = await UserSQL.search_users(keyword, mode, limit + 1, after, fields)
+        return self.map_to_page(users, limit, fields)
+
+    async def count_users_by_role(self) -> list:
+        return [dict(record) for record in await UserSQL.count_users_by_role()]
+
+    async def export_users(self, export_format: str, prefetch: int):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if export_format == "csv" else None
+        if writer:
+            writer.writerow(USER_FIELDS)
+
+        async for user in UserSQL.stream_users(prefetch):
+            row = self.map_to_response(user)
+            if writer:
+                writer.writerow([_export_value(row[field]) for field in USER_FIELDS])
+            else:
+                buffer.write(json.dumps(row, default=_export_value))
+                buffer.write("\n")
+
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    def map_to_page(self, users: list, limit: int, fields: Optional[tuple] = None):
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            last = users[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+        return self.map_to_rows(users, fields), next_cursor
+
+    def map_to_rows(self, users: list, fields: Optional[tuple] = None) -> list:
+        if users and fields and len(fields) != len(users[0]):
+            return [self.map_to_response(user, fields) for user in users]
+        return [dict(user) for user in users]
 
-    def map_to_response(self, user: dict) -> dict:
+    def map_to_response(self, user: dict, fields: Optional[tuple] = None) -> dict:
+        if fields:
+            return {field: user[field] for field in fields}
         return {
             "id": user["id"],
             "email": user["email"],
@@ -91,4 +264,6 @@ class UserService:
         }
 
 
-user_service = UserService()
+user_service = UserService(
+    build_cache(USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_URL, "user:", decode_cached_user, int)
+)
@@ -0,0 +1,368 @@
+import os
+import re
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from src.function.hasher import password_hasher
+from src.function.metrics import instrument_query
+from src.sql.statements import SEARCH_MODES, RANKED_SEARCH_MODES, UPDATE_FIELDS
+from src.types.user_type import CreateUserDto, UpdateUserDto, DuplicateUserError, USER_FIELDS
+
+MEMORY_STORE_SEED = int(os.getenv("MEMORY_STORE_SEED", "0"))
+
+# pg_trgm's default similarity threshold for the % operator.
+SIMILARITY_THRESHOLD = 0.3
+
+SEARCH_FIELDS = ("email", "username", "full_name")
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+LEXEME_PATTERN = re.compile(r"[\w.+-]+@[\w.-]+|[^\W_]+")
+
+
+def now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def trigrams(value: Optional[str]) -> frozenset:
+    grams = set()
+    for word in WORD_PATTERN.findall((value or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def similarity(query: frozenset, grams: frozenset) -> float:
+    # |A & B| / |A | B| is at most min/max of the sizes, which skips most rows cheaply.
+    if not query or not grams or min(len(query), len(grams)) < SIMILARITY_THRESHOLD * max(len(query), len(grams)):
+        return 0.0
+    shared = len(query & grams)
+    return shared / (len(query) + len(grams) - shared)
+
+
+def lexemes(*values: Optional[str]) -> list:
+    return [lexeme for value in values for lexeme in LEXEME_PATTERN.findall((value or "").lower())]
+
+
+class SearchEntry:
+    __slots__ = ("texts", "grams", "words")
+
+    def __init__(self, texts: tuple, grams: tuple, words: list):
+        self.texts = texts
+        self.grams = grams
+        self.words = words
+
+
+class UserStore:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.rows = {}
+        self.by_email = {}
+        self.by_username = {}
+        self.active = []
+        self.search = {}
+        self.lexemes = {}
+        self.next_id = 1
+
+    async def start(self, count: int = MEMORY_STORE_SEED):
+        self.clear()
+        if count:
+            self.seed(count)
+            print(f"🧪 Memory user store seeded with {count} users")
+
+    def seed(self, count: int):
+        import bcrypt
+
+        hashed = bcrypt.hashpw(b"memory-store", bcrypt.gensalt(4)).decode("utf-8")
+        seeded_at = now()
+        for i in range(1, count + 1):
+            self.insert(
+                {
+                    "email": f"user{i}@example.com",
+                    "username": f"user{i}",
+                    "full_name": f"Bench User {i}",
+                    "password": hashed,
+                    "avatar_url": None,
+                    "bio": f"Seeded user number {i}",
+                    "role": "admin" if i % 50 == 0 else "user",
+                    "is_active": i % 20 != 0,
+                    "created_at": seeded_at - timedelta(seconds=i),
+                    "updated_at": seeded_at - timedelta(seconds=i),
+                }
+            )
+
+    def check_unique(self, email: str, username: str, user_id: Optional[int] = None):
+        if self.by_email.get(email, user_id) != user_id:
+            raise DuplicateUserError("email")
+        if self.by_username.get(username, user_id) != user_id:
+            raise DuplicateUserError("username")
+
+    def insert(self, values: dict) -> dict:
+        self.check_unique(values["email"], values["username"])
+        row = {"id": self.next_id, **values}
+        self.next_id += 1
+        self.rows[row["id"]] = row
+        self.index(row)
+        return row
+
+    def update(self, user_id: int, values: dict) -> Optional[dict]:
+        row = self.rows.get(user_id)
+        if row is None:
+            return None
+        self.check_unique(values.get("email", row["email"]), values.get("username", row["username"]), user_id)
+        self.unindex(row)
+        row.update(values, updated_at=now())
+        self.index(row)
+        return row
+
+    def delete(self, user_id: int) -> Optional[dict]:
+        row = self.rows.pop(user_id, None)
+        if row is not None:
+            self.unindex(row)
+        return row
+
+    def index(self, row: dict):
+        self.by_email[row["email"]] = row["id"]
+        self.by_username[row["username"]] = row["id"]
+        if row["is_active"]:
+            insort(self.active, (row["created_at"], row["id"]))
+        texts = tuple((row[field] or "").lower() for field in SEARCH_FIELDS)
+        words = lexemes(row["username"], row["full_name"], row["email"])
+        self.search[row["id"]] = SearchEntry(texts, tuple(trigrams(text) for text in texts), words)
+        for word in words:
+            self.lexemes.setdefault(word, set()).add(row["id"])
+
+    def unindex(self, row: dict):
+        del self.by_email[row["email"]]
+        del self.by_username[row["username"]]
+        if row["is_active"]:
+            key = (row["created_at"], row["id"])
+            del self.active[bisect_left(self.active, key)]
+        for word in self.search.pop(row["id"]).words:
+            ids = self.lexemes.get(word)
+            if ids is not None:
+                ids.discard(row["id"])
+                if not ids:
+                    del self.lexemes[word]
+
+    def newest(self, after: Optional[tuple] = None):
+        end = bisect_left(self.active, tuple(after)) if after else len(self.active)
+        for index in range(end - 1, -1, -1):
+            yield self.rows[self.active[index][1]]
+
+
+store = UserStore()
+
+
+def project(row: Optional[dict], fields: Optional[tuple] = None, required: tuple = ()) -> Optional[dict]:
+    if row is None:
+        return None
+    columns = list(fields or USER_FIELDS)
+    columns.extend(key for key in required if key not in columns)
+    return {column: row[column] for column in columns}
+
+
+@instrument_query
+async def get_users(limit: int, after: Optional[tuple] = None, fields: Optional[tuple] = None):
+    rows = []
+    for row in store.newest(after):
+        if len(rows) == limit:
+            break
+        rows.append(project(row, fields, ("created_at", "id", "updated_at")))
+    return rows
+
+
+@instrument_query
+async def get_user_by_id(user_id: int):
+    return project(store.rows.get(user_id))
+
+
+@instrument_query
+async def get_user_version(user_id: int):
+    row = store.rows.get(user_id)
+    return row["updated_at"] if row else None
+
+
+@instrument_query
+async def get_user_versions(limit: int, after: Optional[tuple] = None):
+    versions = []
+    for row in store.newest(after):
+        if len(versions) == limit:
+            break
+        versions.append((row["id"], row["updated_at"]))
+    return versions
+
+
+@instrument_query
+async def get_users_by_ids(user_ids: list):
+    return [project(store.rows[user_id]) for user_id in user_ids if user_id in store.rows]
+
+
+@instrument_query
+async def get_user_by_email(email: str):
+    return project(store.rows.get(store.by_email.get(email)))
+
+
+@instrument_query
+async def get_user_by_username(username: str):
+    return project(store.rows.get(store.by_username.get(username)))
+
+
+@instrument_query
+async def create_user(data: CreateUserDto):
+    hashed_password = await password_hasher.hash(data.password)
+    timestamp = now()
+    return project(
+        store.insert(
+            {
+                "email": data.email,
+                "username": data.username,
+                "full_name": data.full_name,
+                "password": hashed_password,
+                "avatar_url": data.avatar_url,
+                "bio": data.bio,
+                "role": data.role or "user",
+                "is_active": True,
+                "created_at": timestamp,
+                "updated_at": timestamp,
+            }
+        )
+    )
+
+
+@instrument_query
+async def update_user(user_id: int, data: UpdateUserDto):
+    values = {}
+    for field in UPDATE_FIELDS:
+        value = getattr(data, field)
+        if value is not None:
+            values[field] = value
+
+    if not values:
+        return await get_user_by_id(user_id)
+
+    if "password" in values:
+        values["password"] = await password_hasher.hash(values["password"])
+
+    return project(store.update(user_id, values))
+
+
+@instrument_query
+async def bulk_create_users(records: list) -> set:
+    inserted = set()
+    timestamp = now()
+    for _, email, username, full_name, password, avatar_url, bio, role in sorted(records):
+        try:
+            store.insert(
+                {
+                    "email": email,
+                    "username": username,
+                    "full_name": full_name,
+                    "password": password,
+                    "avatar_url": avatar_url,
+                    "bio": bio,
+                    "role": role,
+                    "is_active": True,
+                    "created_at": timestamp,
+                    "updated_at": timestamp,
+                }
+            )
+        except DuplicateUserError:
+            continue
+        inserted.add(email)
+    return inserted
+
+
+@instrument_query
+async def delete_user(user_id: int) -> bool:
+    return store.delete(user_id) is not None
+
+
+@instrument_query
+async def soft_delete_user(user_id: int):
+    return project(store.update(user_id, {"is_active": False}))
+
+
+@instrument_query
+async def count_users_by_role():
+    counts = {}
+    for row in store.rows.values():
+        role = row["role"] or "user"
+        active, total = counts.get(role, (0, 0))
+        counts[role] = (active + row["is_active"], total + 1)
+    return [
+        {"role": role, "active_count": active, "total_count": total}
+        for role, (active, total) in sorted(counts.items())
+    ]
+
+
+@instrument_query
+async def stream_users(prefetch: int):
+    for user_id in sorted(store.rows):
+        row = store.rows.get(user_id)
+        if row is not None and row["is_active"]:
+            yield project(row)
+
+
+def search_rank(entry: SearchEntry, mode: str, query) -> Optional[float]:
+    if mode == "contains":
+        return 1.0 if any(query in text for text in entry.texts) else None
+    if mode == "prefix":
+        return 1.0 if any(text.startswith(query) for text in entry.texts) else None
+    if mode == "fuzzy":
+        rank = max(similarity(query, grams) for grams in entry.grams)
+        return rank if rank >= SIMILARITY_THRESHOLD else None
+    return sum(entry.words.count(term) for term in query) / len(entry.words)
+
+
+def fulltext_candidates(query: list) -> set:
+    if not query:
+        return set()
+    postings = sorted((store.lexemes.get(term, set()) for term in set(query)), key=len)
+    return set.intersection(*postings)
+
+
+@instrument_query
+async def search_users(
+    keyword: str,
+    mode: str,
+    limit: int,
+    after: Optional[tuple] = None,
+    fields: Optional[tuple] = None,
+):
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unsupported search mode: {mode}")
+
+    if mode == "fuzzy":
+        query = trigrams(keyword)
+    elif mode == "fulltext":
+        query = lexemes(keyword)
+    else:
+        query = keyword.lower()
+
+    if mode not in RANKED_SEARCH_MODES:
+        rows = []
+        for row in store.newest(after):
+            if len(rows) == limit:
+                break
+            if search_rank(store.search[row["id"]], mode, query) is not None:
+                rows.append(project(row, fields, ("created_at", "id")))
+        return rows
+
+    if mode == "fulltext":
+        candidates = (user_id for user_id in fulltext_candidates(query) if store.rows[user_id]["is_active"])
+    else:
+        candidates = (user_id for _, user_id in store.active)
+
+    ranked = []
+    for user_id in candidates:
+        rank = search_rank(store.search[user_id], mode, query)
+        if rank is not None:
+            ranked.append((rank, user_id))
+    ranked.sort(reverse=True)
+    return [project(store.rows[user_id], fields, ("created_at", "id")) for _, user_id in ranked[:limit]]
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
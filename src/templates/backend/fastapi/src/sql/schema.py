@@ -0,0 +1,271 @@
+import asyncio
+import os
+import re
+from typing import Iterable, Tuple
+
+USER_ROLE_COUNTS = os.getenv("USER_ROLE_COUNTS", "false") == "true"
+MIGRATION_LOCK_KEY = int(os.getenv("MIGRATION_LOCK_KEY", "72201"))
+MIGRATION_LOCK_POLL = 0.5
+
+CONCURRENT_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+
+class Migration:
+    def __init__(self, version: int, name: str, statements: Tuple[str, ...], transactional: bool = True, optional: bool = False):
+        self.version = version
+        self.name = name
+        self.statements = statements
+        self.transactional = transactional
+        self.optional = optional
+
+
+CREATE_USERS = """
+CREATE TABLE IF NOT EXISTS users (
+  id SERIAL PRIMARY KEY,
+  email VARCHAR(255) UNIQUE NOT NULL,
+  username VARCHAR(100) UNIQUE NOT NULL,
+  full_name VARCHAR(255) NOT NULL,
+  password VARCHAR(255) NOT NULL,
+  avatar_url TEXT,
+  bio TEXT,
+  role VARCHAR(50) DEFAULT 'user',
+  is_active BOOLEAN DEFAULT true,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
+CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
+"""
+
+# Indexed as an expression rather than a stored generated column, which would rewrite
+# the whole table under an exclusive lock. Queries must use this exact text to match it.
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(username, '') || ' ' || coalesce(full_name, '') || ' ' || coalesce(email, ''))"
+)
+
+SEARCH_INDEXES = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    to_tsvector('simple', coalesce(username, '') || ' ' || coalesce(full_name, '') || ' ' || coalesce(email, ''))
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_users_email_trgm ON users USING GIN (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm ON users USING GIN (username gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm ON users USING GIN (full_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_email_prefix ON users (lower(email) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_users_username_prefix ON users (lower(username) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_users_full_name_prefix ON users (lower(full_name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_users_search_vector ON users USING GIN (search_vector);
+"""
+
+SEARCH_DOCUMENT_INDEX = f"""
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_search_document
+  ON users USING GIN (({SEARCH_DOCUMENT}))
+"""
+
+# Databases created before the expression index carry the generated column and its index.
+DROP_SEARCH_VECTOR_INDEX = "DROP INDEX CONCURRENTLY IF EXISTS idx_users_search_vector"
+DROP_SEARCH_VECTOR = "ALTER TABLE users DROP COLUMN IF EXISTS search_vector"
+
+ACTIVE_USERS_INDEX = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_active_created_at
+  ON users (created_at DESC, id DESC)
+  WHERE is_active = true
+"""
+
+DROP_IS_ACTIVE_INDEX = "DROP INDEX CONCURRENTLY IF EXISTS idx_users_is_active"
+
+ROLE_COUNTS = """
+CREATE TABLE IF NOT EXISTS user_role_counts (
+  role VARCHAR(50) PRIMARY KEY,
+  active_count BIGINT NOT NULL DEFAULT 0,
+  total_count BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION apply_user_role_counts() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO user_role_counts AS counts (role, active_count, total_count)
+    SELECT coalesce(role, 'user'), count(*) FILTER (WHERE is_active), count(*)
+    FROM new_rows
+    GROUP BY 1
+    ON CONFLICT (role) DO UPDATE
+    SET active_count = counts.active_count + EXCLUDED.active_count,
+        total_count = counts.total_count + EXCLUDED.total_count;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO user_role_counts AS counts (role, active_count, total_count)
+    SELECT coalesce(role, 'user'), -count(*) FILTER (WHERE is_active), -count(*)
+    FROM old_rows
+    GROUP BY 1
+    ON CONFLICT (role) DO UPDATE
+    SET active_count = counts.active_count + EXCLUDED.active_count,
+        total_count = counts.total_count + EXCLUDED.total_count;
+  ELSE
+    INSERT INTO user_role_counts AS counts (role, active_count, total_count)
+    SELECT role, sum(active), sum(total)
+    FROM (
+      SELECT coalesce(role, 'user') AS role, CASE WHEN is_active THEN 1 ELSE 0 END AS active, 1 AS total FROM new_rows
+      UNION ALL
+      SELECT coalesce(role, 'user'), CASE WHEN is_active THEN -1 ELSE 0 END, -1 FROM old_rows
+    ) AS deltas
+    GROUP BY role
+    HAVING sum(active) <> 0 OR sum(total) <> 0
+    ON CONFLICT (role) DO UPDATE
+    SET active_count = counts.active_count + EXCLUDED.active_count,
+        total_count = counts.total_count + EXCLUDED.total_count;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+LOCK TABLE users IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS users_role_counts_insert ON users;
+DROP TRIGGER IF EXISTS users_role_counts_update ON users;
+DROP TRIGGER IF EXISTS users_role_counts_delete ON users;
+
+CREATE TRIGGER users_role_counts_insert AFTER INSERT ON users
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION apply_user_role_counts();
+CREATE TRIGGER users_role_counts_update AFTER UPDATE ON users
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION apply_user_role_counts();
+CREATE TRIGGER users_role_counts_delete AFTER DELETE ON users
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION apply_user_role_counts();
+
+DELETE FROM user_role_counts;
+INSERT INTO user_role_counts (role, active_count, total_count)
+SELECT coalesce(role, 'user'), count(*) FILTER (WHERE is_active), count(*)
+FROM users
+GROUP BY 1;
+"""
+
+USER_EVENTS = """
+CREATE TABLE IF NOT EXISTS user_events (
+  id BIGSERIAL PRIMARY KEY,
+  user_id INTEGER NOT NULL,
+  event_type VARCHAR(32) NOT NULL,
+  payload JSONB NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+MIGRATIONS = (
+    Migration(1, "create_users", (CREATE_USERS,)),
+    Migration(2, "search_indexes", (SEARCH_INDEXES,)),
+    Migration(3, "active_users_index", (ACTIVE_USERS_INDEX, DROP_IS_ACTIVE_INDEX), transactional=False),
+    Migration(4, "user_role_counts", (ROLE_COUNTS,), optional=True),
+    Migration(5, "user_events", (USER_EVENTS,)),
+    Migration(
+        6,
+        "search_document_index",
+        (SEARCH_DOCUMENT_INDEX, DROP_SEARCH_VECTOR_INDEX, DROP_SEARCH_VECTOR),
+        transactional=False,
+    ),
+)
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version INTEGER PRIMARY KEY,
+  name VARCHAR(100) NOT NULL,
+  applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def schema_sql(migrations: Iterable[Migration] = MIGRATIONS) -> str:
+    statements = []
+    for migration in migrations:
+        if migration.optional:
+            continue
+        for statement in migration.statements:
+            statements.append(statement.replace(" CONCURRENTLY", "").strip().rstrip(";") + ";")
+    return "\n\n".join(statements) + "\n"
+
+
+def enabled_migrations(role_counts: bool = USER_ROLE_COUNTS) -> list:
+    return [
+        migration for migration in MIGRATIONS
+        if not migration.optional or (migration.name == "user_role_counts" and role_counts)
+    ]
+
+
+async def drop_invalid_index(conn, statement: str):
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which IF NOT EXISTS
+    # would then skip on the rerun. Drop it so the statement builds it again.
+    match = CONCURRENT_INDEX.search(statement)
+    if match is None:
+        return
+    invalid = await conn.fetchval(
+        "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)",
+        match.group(1),
+    )
+    if invalid:
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+
+
+async def apply_migrations(conn, role_counts: bool = USER_ROLE_COUNTS) -> list:
+    # Session lock, so workers or pods starting together apply each migration once. It is
+    # polled rather than waited on: a session blocked in pg_advisory_lock holds a snapshot,
+    # and CREATE INDEX CONCURRENTLY in the holder would wait on it forever.
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_KEY):
+        await asyncio.sleep(MIGRATION_LOCK_POLL)
+    try:
+        return await _apply_migrations(conn, role_counts)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+
+async def _apply_migrations(conn, role_counts: bool) -> list:
+    await conn.execute(CREATE_MIGRATIONS_TABLE)
+    applied = {record["version"] for record in await conn.fetch("SELECT version FROM schema_migrations")}
+
+    ran = []
+    for migration in enabled_migrations(role_counts):
+        if migration.version in applied:
+            continue
+
+        if migration.transactional:
+            async with conn.transaction():
+                for statement in migration.statements:
+                    await conn.execute(statement)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                    migration.version,
+                    migration.name,
+                )
+        else:
+            for statement in migration.statements:
+                await drop_invalid_index(conn, statement)
+                await conn.execute(statement)
+            await conn.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                migration.version,
+                migration.name,
+            )
+        ran.append(migration.name)
+    return ran
+
+
+if __name__ == "__main__":
+    import asyncpg
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    from src.db import DATABASE_URL
+
+    async def main():
+        conn = await asyncpg.connect(DATABASE_URL)
+        try:
+            ran = await apply_migrations(conn)
+        finally:
+            await conn.close()
+        print(f"🗄️  Applied migrations: {', '.join(ran) if ran else 'none, schema is up to date'}")
+
+    asyncio.run(main())
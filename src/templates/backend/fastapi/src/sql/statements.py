@@ -0,0 +1,224 @@
+from functools import lru_cache
+from typing import Optional
+from src.sql.schema import SEARCH_DOCUMENT
+from src.types.user_type import USER_FIELDS
+
+USER_COLUMNS = ", ".join(USER_FIELDS)
+
+UPDATE_FIELDS = ("email", "username", "full_name", "password", "avatar_url", "bio", "role", "is_active")
+
+SELECT_USER_BY_ID = f"""
+    SELECT {USER_COLUMNS}
+    FROM users
+    WHERE id = $1
+"""
+
+SELECT_USER_VERSION = """
+    SELECT updated_at
+    FROM users
+    WHERE id = $1
+"""
+
+SELECT_USERS_BY_IDS = f"""
+    SELECT {USER_COLUMNS}
+    FROM users
+    WHERE id = ANY($1::int[])
+"""
+
+SELECT_USER_BY_EMAIL = f"""
+    SELECT {USER_COLUMNS}
+    FROM users
+    WHERE email = $1
+"""
+
+SELECT_USER_BY_USERNAME = f"""
+    SELECT {USER_COLUMNS}
+    FROM users
+    WHERE username = $1
+"""
+
+INSERT_USER = f"""
+    INSERT INTO users (email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    RETURNING {USER_COLUMNS}
+"""
+
+DELETE_USER = """
+    DELETE FROM users
+    WHERE id = $1
+    RETURNING id
+"""
+
+SOFT_DELETE_USER = f"""
+    UPDATE users
+    SET is_active = false, updated_at = CURRENT_TIMESTAMP
+    WHERE id = $1
+    RETURNING {USER_COLUMNS}
+"""
+
+EXPORT_USERS = f"""
+    SELECT {USER_COLUMNS}
+    FROM users
+    WHERE is_active = true
+    ORDER BY id
+"""
+
+COUNT_USERS_BY_ROLE = """
+    SELECT coalesce(role, 'user') AS role,
+           count(*) FILTER (WHERE is_active) AS active_count,
+           count(*) AS total_count
+    FROM users
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+SELECT_USER_ROLE_COUNTS = """
+    SELECT role, active_count, total_count
+    FROM user_role_counts
+    WHERE total_count > 0
+    ORDER BY role
+"""
+
+BULK_INSERT_STAGED_USERS = """
+    INSERT INTO users (email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at)
+    SELECT email, username, full_name, password, avatar_url, bio, role, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    FROM users_staging
+    ORDER BY row_number
+    ON CONFLICT DO NOTHING
+    RETURNING email
+"""
+
+
+def with_event(statement: str, event_type: str, payload: str = "to_jsonb(changed)") -> str:
+    return f"""
+    WITH changed AS ({statement}),
+    event AS (
+        INSERT INTO user_events (user_id, event_type, payload)
+        SELECT id, '{event_type}', {payload}
+        FROM changed
+    )
+    SELECT * FROM changed
+"""
+
+
+SELECT_USER_EVENTS = """
+    SELECT id, user_id, event_type, payload, created_at
+    FROM user_events
+    WHERE id > $1
+    ORDER BY id
+    LIMIT $2
+"""
+
+DELETE_USER_EVENTS = """
+    DELETE FROM user_events
+    WHERE id = ANY($1::bigint[])
+"""
+
+INSERT_USER_WITH_EVENT = with_event(INSERT_USER, "user.created")
+DELETE_USER_WITH_EVENT = with_event(DELETE_USER, "user.deleted", "jsonb_build_object('id', id)")
+SOFT_DELETE_USER_WITH_EVENT = with_event(SOFT_DELETE_USER, "user.deactivated")
+BULK_INSERT_STAGED_USERS_WITH_EVENT = with_event(
+    BULK_INSERT_STAGED_USERS.replace("RETURNING email", f"RETURNING {USER_COLUMNS}"),
+    "user.created",
+)
+
+SEARCH_MODES = ("contains", "prefix", "fuzzy", "fulltext")
+RANKED_SEARCH_MODES = ("fuzzy", "fulltext")
+
+SEARCH_CONDITIONS = {
+    "contains": "(email ILIKE $2 OR username ILIKE $2 OR full_name ILIKE $2)",
+    "prefix": """(
+        (lower(email) ~>=~ $2 AND lower(email) ~<~ $3)
+        OR (lower(username) ~>=~ $2 AND lower(username) ~<~ $3)
+        OR (lower(full_name) ~>=~ $2 AND lower(full_name) ~<~ $3)
+      )""",
+    "fuzzy": "(email % $2 OR username % $2 OR full_name % $2)",
+    "fulltext": f"{SEARCH_DOCUMENT} @@ websearch_to_tsquery('simple', $2)",
+}
+
+SEARCH_PARAM_COUNTS = {
+    "contains": 1,
+    "prefix": 2,
+    "fuzzy": 1,
+    "fulltext": 1,
+}
+
+SEARCH_RANKS = {
+    "fuzzy": "GREATEST(similarity(email, $2), similarity(username, $2), similarity(full_name, $2))",
+    "fulltext": f"ts_rank({SEARCH_DOCUMENT}, websearch_to_tsquery('simple', $2))",
+}
+
+
+def select_columns(fields: Optional[tuple] = None, required: tuple = ("created_at", "id")) -> str:
+    columns = list(fields or USER_FIELDS)
+    for key in required:
+        if key not in columns:
+            columns.append(key)
+    return ", ".join(columns)
+
+
+@lru_cache(maxsize=None)
+def update_user_statement(fields: tuple) -> str:
+    set_parts = [f"{field} = ${index}" for index, field in enumerate(fields, start=1)]
+    set_parts.append("updated_at = CURRENT_TIMESTAMP")
+    return f"""
+    UPDATE users
+    SET {', '.join(set_parts)}
+    WHERE id = ${len(fields) + 1}
+    RETURNING {USER_COLUMNS}
+"""
+
+
+@lru_cache(maxsize=None)
+def update_user_with_event_statement(fields: tuple) -> str:
+    changed_fields = ", ".join(f"'{field}'" for field in fields)
+    return with_event(
+        update_user_statement(fields),
+        "user.updated",
+        f"jsonb_build_object('user', to_jsonb(changed), 'fields', jsonb_build_array({changed_fields}))",
+    )
+
+
+@lru_cache(maxsize=1024)
+def list_users_statement(fields: Optional[tuple], keyset: bool) -> str:
+    keyset_condition = "AND (created_at, id) < ($2, $3)" if keyset else ""
+    return f"""
+    SELECT {select_columns(fields, ("created_at", "id", "updated_at"))}
+    FROM users
+    WHERE is_active = true {keyset_condition}
+    ORDER BY created_at DESC, id DESC
+    LIMIT $1
+"""
+
+
+@lru_cache(maxsize=None)
+def list_user_versions_statement(keyset: bool) -> str:
+    keyset_condition = "AND (created_at, id) < ($2, $3)" if keyset else ""
+    return f"""
+    SELECT id, updated_at
+    FROM users
+    WHERE is_active = true {keyset_condition}
+    ORDER BY created_at DESC, id DESC
+    LIMIT $1
+"""
+
+
+@lru_cache(maxsize=1024)
+def search_users_statement(mode: str, fields: Optional[tuple], keyset: bool) -> str:
+    keyset_condition = ""
+    if mode in RANKED_SEARCH_MODES:
+        order_by = f"{SEARCH_RANKS[mode]} DESC, id DESC"
+    else:
+        order_by = "created_at DESC, id DESC"
+        if keyset:
+            index = SEARCH_PARAM_COUNTS[mode] + 2
+            keyset_condition = f"AND (created_at, id) < (${index}, ${index + 1})"
+
+    return f"""
+    SELECT {select_columns(fields)}
+    FROM users
+    WHERE is_active = true
+      AND {SEARCH_CONDITIONS[mode]} {keyset_condition}
+    ORDER BY {order_by}
+    LIMIT $1
+"""
@@ -1,197 +1,243 @@
-import bcrypt
-from datetime import datetime
-from src.db import get_db
-from src.types.user_type import User, CreateUserDto, UpdateUserDto
+from typing import Optional
+import asyncpg
+from src.db import after_commit, get_db
+from src.function.hasher import password_hasher
+from src.function.metrics import instrument_query
+from src.function.outbox import OUTBOX_ENABLED, outbox
+from src.sql import statements
+from src.sql.schema import USER_ROLE_COUNTS, schema_sql
+from src.sql.statements import SEARCH_MODES, RANKED_SEARCH_MODES, UPDATE_FIELDS
+from src.types.user_type import CreateUserDto, UpdateUserDto, DuplicateUserError
 
-SALT_ROUNDS = 10
+MAX_CODE_POINT = chr(0x10FFFF)
+SURROGATES = (0xD800, 0xDFFF)
 
+UNIQUE_CONSTRAINTS = {
+    "users_email_key": "email",
+    "users_username_key": "username",
+}
 
-async def get_users():
-    query = """
-        SELECT id, email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at
-        FROM users
-        WHERE is_active = true
-        ORDER BY created_at DESC
-    """
-    conn = await get_db()
-    result = await conn.fetch(query)
-    return result
 
+def duplicate_user_error(error: asyncpg.UniqueViolationError) -> DuplicateUserError:
+    return DuplicateUserError(UNIQUE_CONSTRAINTS.get(error.constraint_name, "user"))
 
+
+async def notify_outbox(changed):
+    if OUTBOX_ENABLED and changed:
+        await after_commit(outbox.notify)
+
+
+@instrument_query
+async def get_users(limit: int, after: Optional[tuple] = None, fields: Optional[tuple] = None):
+    query = statements.list_users_statement(fields, after is not None)
+    async with get_db(readonly=True) as conn:
+        return await conn.fetch(query, limit, *(after or ()))
+
+
+@instrument_query
 async def get_user_by_id(user_id: int):
-    query = """
-        SELECT id, email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at
-        FROM users
-        WHERE id = $1
-    """
-    conn = await get_db()
-    result = await conn.fetchrow(query, user_id)
-    return result
+    async with get_db(readonly=True) as conn:
+        return await conn.fetchrow(statements.SELECT_USER_BY_ID, user_id)
 
 
-async def get_user_by_email(email: str):
-    query = """
-        SELECT id, email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at
-        FROM users
-        WHERE email = $1
-    """
-    conn = await get_db()
-    result = await conn.fetchrow(query, email)
-    return result
+@instrument_query
+async def get_user_version(user_id: int):
+    async with get_db(readonly=True) as conn:
+        return await conn.fetchval(statements.SELECT_USER_VERSION, user_id)
 
 
-async def get_user_by_username(username: str):
-    query = """
-        SELECT id, email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at
-        FROM users
-        WHERE username = $1
-    """
-    conn = await get_db()
-    result = await conn.fetchrow(query, username)
-    return result
+@instrument_query
+async def get_user_versions(limit: int, after: Optional[tuple] = None):
+    query = statements.list_user_versions_statement(after is not None)
+    async with get_db(readonly=True) as conn:
+        return await conn.fetch(query, limit, *(after or ()))
 
 
-async def create_user(data: CreateUserDto):
-    hashed_password = bcrypt.hashpw(data.password.encode("utf-8"), bcrypt.gensalt(SALT_ROUNDS)).decode("utf-8")
-
-    query = """
-        INSERT INTO users (email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at)
-        VALUES ($1, $2, $3, $4, $5, $6, $7, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        RETURNING id, email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at
-    """
-    conn = await get_db()
-    result = await conn.fetchrow(
-        query,
-        data.email,
-        data.username,
-        data.full_name,
-        hashed_password,
-        data.avatar_url,
-        data.bio,
-        data.role or "user",
-    )
-    return result
+@instrument_query
+async def get_users_by_ids(user_ids: list):
+    async with get_db(readonly=True, fresh=True) as conn:
+        return await conn.fetch(statements.SELECT_USERS_BY_IDS, user_ids)
 
 
-async def update_user(user_id: int, data: UpdateUserDto):
-    set_parts = []
-    values = []
-    param_index = 1
-
-    if data.email is not None:
-        set_parts.append(f"email = ${param_index}")
-        values.append(data.email)
-        param_index += 1
-
-    if data.username is not None:
-        set_parts.append(f"username = ${param_index}")
-        values.append(data.username)
-        param_index += 1
-
-    if data.full_name is not None:
-        set_parts.append(f"full_name = ${param_index}")
-        values.append(data.full_name)
-        param_index += 1
-
-    if data.password is not None:
-        hashed_password = bcrypt.hashpw(data.password.encode("utf-8"), bcrypt.gensalt(SALT_ROUNDS)).decode("utf-8")
-        set_parts.append(f"password = ${param_index}")
-        values.append(hashed_password)
-        param_index += 1
-
-    if data.avatar_url is not None:
-        set_parts.append(f"avatar_url = ${param_index}")
-        values.append(data.avatar_url)
-        param_index += 1
-
-    if data.bio is not None:
-        set_parts.append(f"bio = ${param_index}")
-        values.append(data.bio)
-        param_index += 1
-
-    if data.role is not None:
-        set_parts.append(f"role = ${param_index}")
-        values.append(data.role)
-        param_index += 1
-
-    if data.is_active is not None:
-        set_parts.append(f"is_active = ${param_index}")
-        values.append(data.is_active)
-        param_index += 1
-
-    if not set_parts:
-        return await get_user_by_id(user_id)
+@instrument_query
+async def get_user_by_email(email: str):
+    async with get_db(readonly=True) as conn:
+        return await conn.fetchrow(statements.SELECT_USER_BY_EMAIL, email)
+
+
+@instrument_query
+async def get_user_by_username(username: str):
+    async with get_db(readonly=True) as conn:
+        return await conn.fetchrow(statements.SELECT_USER_BY_USERNAME, username)
 
-    set_parts.append("updated_at = CURRENT_TIMESTAMP")
-    query = f"""
-        UPDATE users
-        SET {', '.join(set_parts)}
-        WHERE id = ${param_index}
-        RETURNING id, email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at
-    """
-    values.append(user_id)
 
-    conn = await get_db()
-    result = await conn.fetchrow(query, *values)
-    return result
+@instrument_query
+async def create_user(data: CreateUserDto):
+    hashed_password = await password_hasher.hash(data.password)
+
+    async with get_db() as conn:
+        try:
+            user = await conn.fetchrow(
+                statements.INSERT_USER_WITH_EVENT if OUTBOX_ENABLED else statements.INSERT_USER,
+                data.email,
+                data.username,
+                data.full_name,
+                hashed_password,
+                data.avatar_url,
+                data.bio,
+                data.role or "user",
+            )
+        except asyncpg.UniqueViolationError as e:
+            raise duplicate_user_error(e)
+    await notify_outbox(user)
+    return user
+
+
+@instrument_query
+async def update_user(user_id: int, data: UpdateUserDto):
+    values = {}
+    for field in UPDATE_FIELDS:
+        value = getattr(data, field)
+        if value is not None:
+            values[field] = value
 
+    if not values:
+        return await get_user_by_id(user_id)
 
+    if "password" in values:
+        values["password"] = await password_hasher.hash(values["password"])
+
+    if OUTBOX_ENABLED:
+        query = statements.update_user_with_event_statement(tuple(values))
+    else:
+        query = statements.update_user_statement(tuple(values))
+    async with get_db() as conn:
+        try:
+            user = await conn.fetchrow(query, *values.values(), user_id)
+        except asyncpg.UniqueViolationError as e:
+            raise duplicate_user_error(e)
+    await notify_outbox(user)
+    return user
+
+
+@instrument_query
+async def bulk_create_users(records: list) -> set:
+    async with get_db() as conn:
+        async with conn.transaction():
+            await conn.execute("""
+                CREATE TEMP TABLE users_staging (
+                  row_number INTEGER,
+                  email VARCHAR(255),
+                  username VARCHAR(100),
+                  full_name VARCHAR(255),
+                  password VARCHAR(255),
+                  avatar_url TEXT,
+                  bio TEXT,
+                  role VARCHAR(50)
+                ) ON COMMIT DROP
+            """)
+            await conn.copy_records_to_table(
+                "users_staging",
+                records=records,
+                columns=["row_number", "email", "username", "full_name", "password", "avatar_url", "bio", "role"],
+            )
+            inserted = await conn.fetch(
+                statements.BULK_INSERT_STAGED_USERS_WITH_EVENT if OUTBOX_ENABLED else statements.BULK_INSERT_STAGED_USERS
+            )
+    await notify_outbox(inserted)
+    return {record["email"] for record in inserted}
+
+
+@instrument_query
 async def delete_user(user_id: int) -> bool:
-    query = """
-        DELETE FROM users
-        WHERE id = $1
-    """
-    conn = await get_db()
-    result = await conn.execute(query, user_id)
-    return result == "DELETE 1"
+    async with get_db() as conn:
+        deleted = await conn.fetchrow(
+            statements.DELETE_USER_WITH_EVENT if OUTBOX_ENABLED else statements.DELETE_USER, user_id
+        )
+    await notify_outbox(deleted)
+    return deleted is not None
 
 
+@instrument_query
 async def soft_delete_user(user_id: int):
-    query = """
-        UPDATE users
-        SET is_active = false, updated_at = CURRENT_TIMESTAMP
-        WHERE id = $1
-        RETURNING id, email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at
-    """
-    conn = await get_db()
-    result = await conn.fetchrow(query, user_id)
-    return result
-
-
-async def search_users(keyword: str):
-    query = """
-        SELECT id, email, username, full_name, password, avatar_url, bio, role, is_active, created_at, updated_at
-        FROM users
-        WHERE is_active = true
-          AND (email ILIKE $1 OR username ILIKE $1 OR full_name ILIKE $1)
-        ORDER BY created_at DESC
-    """
-    conn = await get_db()
-    result = await conn.fetch(query, f"%{keyword}%")
-    return result
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
-
-
-user_table_schema = """
-CREATE TABLE IF NOT EXISTS users (
-  id SERIAL PRIMARY KEY,
-  email VARCHAR(255) UNIQUE NOT NULL,
-  username VARCHAR(100) UNIQUE NOT NULL,
-  full_name VARCHAR(255) NOT NULL,
-  password VARCHAR(255) NOT NULL,
-  avatar_url TEXT,
-  bio TEXT,
-  role VARCHAR(50) DEFAULT 'user',
-  is_active BOOLEAN DEFAULT true,
-  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
-CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
-CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
-CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
-CREATE INDEX IF NOT EXISTS idx_users_is_active ON users(is_active);
-"""
+    async with get_db() as conn:
+        user = await conn.fetchrow(
+            statements.SOFT_DELETE_USER_WITH_EVENT if OUTBOX_ENABLED else statements.SOFT_DELETE_USER, user_id
+        )
+    await notify_outbox(user)
+    return user
+
+
+@instrument_query
+async def count_users_by_role():
+    async with get_db(readonly=True) as conn:
+        if USER_ROLE_COUNTS:
+            return await conn.fetch(statements.SELECT_USER_ROLE_COUNTS)
+        return await conn.fetch(statements.COUNT_USERS_BY_ROLE)
+
+
+@instrument_query
+async def stream_users(prefetch: int):
+    async with get_db(readonly=True) as conn:
+        async with conn.transaction(readonly=True):
+            async for record in conn.cursor(statements.EXPORT_USERS, prefetch=prefetch):
+                yield record
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    # The smallest string above every string starting with prefix. Trailing U+10FFFF has no
+    # successor, and the step after U+D7FF skips the surrogates asyncpg cannot encode.
+    stem = prefix.rstrip(MAX_CODE_POINT)
+    if not stem:
+        return None
+    code = ord(stem[-1]) + 1
+    if SURROGATES[0] <= code <= SURROGATES[1]:
+        code = SURROGATES[1] + 1
+    return stem[:-1] + chr(code)
+
+
+def search_params(keyword: str, mode: str) -> list:
+    if mode == "contains":
+        return [f"%{escape_like(keyword)}%"]
+    if mode == "prefix":
+        prefix = keyword.lower()
+        upper = prefix_upper_bound(prefix)
+        if upper is None:
+            return [f"{escape_like(keyword)}%"]
+        return [prefix, upper]
+    return [keyword]
+
+
+@instrument_query
+async def search_users(
+    keyword: str,
+    mode: str,
+    limit: int,
+    after: Optional[tuple] = None,
+    fields: Optional[tuple] = None,
+):
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unsupported search mode: {mode}")
+
+    keyset = after is not None and mode not in RANKED_SEARCH_MODES
+    params = search_params(keyword, mode)
+    values = [limit, *params]
+    if keyset:
+        values.extend(after)
+
+    # A prefix with no upper bound comes back as one anchored pattern for the ILIKE condition.
+    statement_mode = "contains" if mode == "prefix" and len(params) == 1 else mode
+    query = statements.search_users_statement(statement_mode, fields, keyset)
+    async with get_db(readonly=True) as conn:
+        return await conn.fetch(query, *values)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+user_table_schema = schema_sql()
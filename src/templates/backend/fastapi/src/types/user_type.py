@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 from pydantic import BaseModel, EmailStr, Field
 
 
@@ -57,8 +57,18 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+USER_FIELDS = tuple(UserResponse.model_fields)
+
+
+class DuplicateUserError(Exception):
+    def __init__(self, field: str):
+        super().__init__(f"User with this {field} already exists")
+        self.field = field
+
+
 class ApiResponse(BaseModel):
     success: bool
-    data: Optional[any] = None
+    data: Optional[Any] = None
     message: Optional[str] = None
     error: Optional[str] = None
+    next_cursor: Optional[str] = None
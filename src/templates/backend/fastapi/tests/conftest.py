@@ -0,0 +1,105 @@
+import os
+import sys
+from pathlib import Path
+
+import asyncpg
+import httpx
+import pytest
+from dotenv import load_dotenv
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+TEST_DB_NAME = os.getenv("TEST_DB_NAME", "users_test")
+
+sys.path.insert(0, str(PROJECT_ROOT))
+load_dotenv(PROJECT_ROOT / ".env")
+os.environ.update(ADMISSION_ENABLED="false", BCRYPT_ROUNDS="4", MEMORY_STORE_SEED="0")
+
+TRIGRAM_FRAGMENTS = (
+    ("CREATE EXTENSION IF NOT EXISTS pg_trgm;", ""),
+    (" gin_trgm_ops", ""),
+    ("USING GIN (email", "(email"),
+    ("USING GIN (username", "(username"),
+    ("USING GIN (full_name", "(full_name"),
+)
+
+
+def database_url(name: str) -> str:
+    return (
+        f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+        f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{name}"
+    )
+
+
+def import_app(store: str):
+    # USER_STORE and the DSN are read at import time, so each backend gets fresh src modules.
+    for name in [name for name in sys.modules if name == "src" or name.startswith("src.")]:
+        del sys.modules[name]
+    os.environ["USER_STORE"] = store
+    os.environ["DB_NAME"] = TEST_DB_NAME
+    from src.main import app
+
+    return app
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def postgres(anyio_backend):
+    """Creates the test database once and reports whether Postgres and pg_trgm are available."""
+    if not os.getenv("DB_HOST"):
+        return {"error": "DB_HOST is not set"}
+    try:
+        conn = await asyncpg.connect(database_url(os.getenv("DB_NAME", "postgres")))
+    except (OSError, ValueError, asyncpg.PostgresError) as e:
+        return {"error": f"Postgres is not reachable: {e}"}
+    try:
+        if not await conn.fetchval("SELECT 1 FROM pg_database WHERE datname = $1", TEST_DB_NAME):
+            await conn.execute(f'CREATE DATABASE "{TEST_DB_NAME}"')
+    finally:
+        await conn.close()
+
+    from src.sql.schema import schema_sql
+
+    schema = schema_sql()
+    conn = await asyncpg.connect(database_url(TEST_DB_NAME))
+    try:
+        await conn.execute("DROP TABLE IF EXISTS users CASCADE")
+        try:
+            await conn.execute(schema)
+            trigrams = True
+        except (asyncpg.FeatureNotSupportedError, asyncpg.UndefinedFileError):
+            trigrams = False
+            await conn.execute("DROP TABLE IF EXISTS users CASCADE")
+            for fragment, replacement in TRIGRAM_FRAGMENTS:
+                schema = schema.replace(fragment, replacement)
+            await conn.execute(schema)
+    finally:
+        await conn.close()
+    return {"error": None, "trigrams": trigrams}
+
+
+@pytest.fixture(params=["postgres", "memory"])
+async def backend(request, postgres):
+    features = {"store": request.param, "trigrams": True}
+    if request.param == "postgres":
+        if postgres["error"]:
+            pytest.skip(postgres["error"])
+        features["trigrams"] = postgres["trigrams"]
+        conn = await asyncpg.connect(database_url(TEST_DB_NAME))
+        try:
+            await conn.execute("TRUNCATE users RESTART IDENTITY CASCADE")
+        finally:
+            await conn.close()
+    return features
+
+
+@pytest.fixture
+async def client(backend):
+    app = import_app(backend["store"])
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
@@ -0,0 +1,152 @@
+"""Behaviour every USER_STORE backend must share, run against Postgres and memory."""
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+ALICE = {"email": "alice@example.com", "username": "alice", "full_name": "Alice Liddell", "password": "secret1"}
+
+
+def user(name: str, **overrides) -> dict:
+    return {
+        "email": f"{name}@example.com",
+        "username": name,
+        "full_name": f"{name.title()} Tester",
+        "password": "secret1",
+        **overrides,
+    }
+
+
+async def create(client, data: dict) -> dict:
+    response = await client.post("/users/", json=data)
+    assert response.status_code == 201, response.text
+    return response.json()["data"]
+
+
+async def test_create_read_update_delete(client):
+    created = await create(client, ALICE)
+    assert created["username"] == "alice"
+    assert "password" not in created
+
+    response = await client.get(f"/users/{created['id']}")
+    assert response.status_code == 200
+    assert response.json()["data"]["email"] == "alice@example.com"
+
+    response = await client.put(f"/users/{created['id']}", json={"bio": "Down the rabbit hole", "role": "editor"})
+    assert response.status_code == 200
+    assert response.json()["data"]["bio"] == "Down the rabbit hole"
+    assert (await client.get(f"/users/{created['id']}")).json()["data"]["role"] == "editor"
+
+    response = await client.post(f"/users/{created['id']}/soft-delete")
+    assert response.status_code == 200
+    assert response.json()["data"]["is_active"] is False
+
+    response = await client.delete(f"/users/{created['id']}")
+    assert response.status_code == 200
+    assert (await client.get(f"/users/{created['id']}")).status_code == 404
+
+
+@pytest.mark.parametrize("field", ["email", "username"])
+async def test_duplicate_create_conflicts(client, field):
+    await create(client, ALICE)
+    other = user("bob")
+    other[field] = ALICE[field]
+
+    response = await client.post("/users/", json=other)
+    assert response.status_code == 409
+
+
+@pytest.mark.parametrize("field", ["email", "username"])
+async def test_duplicate_update_conflicts(client, field):
+    await create(client, ALICE)
+    bob = await create(client, user("bob"))
+
+    response = await client.put(f"/users/{bob['id']}", json={field: ALICE[field]})
+    assert response.status_code == 409
+    assert (await client.get(f"/users/{bob['id']}")).json()["data"][field] == user("bob")[field]
+
+
+@pytest.mark.parametrize(
+    "method, path",
+    [
+        ("GET", "/users/999"),
+        ("PUT", "/users/999"),
+        ("DELETE", "/users/999"),
+        ("POST", "/users/999/soft-delete"),
+    ],
+)
+async def test_missing_user_is_not_found(client, method, path):
+    response = await client.request(method, path, json={"bio": "nobody"} if method == "PUT" else None)
+    assert response.status_code == 404
+
+
+async def test_keyset_pagination_walks_every_active_user_once(client):
+    ids = [(await create(client, user(f"user{i}")))["id"] for i in range(7)]
+    inactive = await create(client, user("gone"))
+    await client.post(f"/users/{inactive['id']}/soft-delete")
+
+    first = (await client.get("/users/", params={"limit": 10})).json()
+    assert first["next_cursor"] is None
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/users/", params=params)).json()
+        assert len(page["data"]) <= 3
+        seen.extend(row["id"] for row in page["data"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [row["id"] for row in first["data"]]
+    assert sorted(seen) == sorted(ids)
+
+
+async def test_pagination_rejects_bad_cursor(client):
+    response = await client.get("/users/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "mode, keyword",
+    [
+        ("contains", "iddel"),
+        ("prefix", "ali"),
+        ("fuzzy", "alise"),
+        ("fulltext", "liddell"),
+    ],
+)
+async def test_search_modes(client, backend, mode, keyword):
+    if mode == "fuzzy" and not backend["trigrams"]:
+        pytest.skip("fuzzy search needs pg_trgm")
+    await create(client, ALICE)
+    await create(client, user("bob", full_name="Bob Builder"))
+    await create(client, user("carol", full_name="Carol Singer"))
+
+    response = await client.get(f"/users/search/{keyword}", params={"mode": mode})
+    assert response.status_code == 200
+    usernames = [row["username"] for row in response.json()["data"]]
+    assert usernames[0] == "alice"
+    assert "bob" not in usernames and "carol" not in usernames
+
+
+async def test_search_skips_inactive_users(client):
+    alice = await create(client, ALICE)
+    await client.post(f"/users/{alice['id']}/soft-delete")
+
+    response = await client.get("/users/search/alice", params={"mode": "prefix"})
+    assert response.json()["data"] == []
+
+
+async def test_role_counts(client):
+    await create(client, ALICE)
+    await create(client, user("bob"))
+    admin = await create(client, user("carol"))
+    await client.put(f"/users/{admin['id']}", json={"role": "admin"})
+    await client.post(f"/users/{admin['id']}/soft-delete")
+
+    response = await client.get("/users/roles")
+    assert response.status_code == 200
+    counts = {row["role"]: (row["active_count"], row["total_count"]) for row in response.json()["data"]}
+    assert counts == {"admin": (0, 1), "user": (2, 2)}
@@ -157,9 +157,9 @@ export function getPackageManagerRunCmd(packageManager: string, script: string):
     case "bun":
       return `bun run ${script}`;
     case "venv":
-      return `source venv/bin/activate && python src/main.py`;
+      return `source venv/bin/activate && python -m src.server`;
     case "pip":
-      return `python src/main.py`;
+      return `python -m src.server`;
     default:
       return `npm run ${script}`;
   }